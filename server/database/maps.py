@@ -5,10 +5,12 @@ import requests
 load_dotenv()
 
 google_maps_api_key = os.getenv("REACT_APP_GOOGLE_MAPS_API_KEY")
+places_base_url = os.getenv("GOOGLE_PLACES_BASE_URL", "https://places.googleapis.com")
+routes_base_url = os.getenv("GOOGLE_ROUTES_BASE_URL", "https://routes.googleapis.com")
 
 def get_place_id(location, api_key):
     response = requests.post(
-        'https://places.googleapis.com/v1/places:searchText',
+        f'{places_base_url}/v1/places:searchText',
         headers={
             'Content-Type': 'application/json',
             'X-Goog-Api-Key': api_key,
@@ -23,7 +25,7 @@ def get_place_id(location, api_key):
 
 def get_formatted_address(place_id, api_key):
     response = requests.get(
-        f'https://places.googleapis.com/v1/places/{place_id}',
+        f'{places_base_url}/v1/places/{place_id}',
         headers={
             'Content-Type': 'application/json',
             'X-Goog-Api-Key': api_key,
@@ -36,7 +38,7 @@ def get_formatted_address(place_id, api_key):
 # get the time estimate between two locations using place id using the route api
 def get_time_estimate(origin_place_id, destination_place_id, api_key):
     response = requests.post(
-        f"https://routes.googleapis.com/directions/v2:computeRoutes",
+        f"{routes_base_url}/directions/v2:computeRoutes",
         headers={
             'Content-Type': 'application/json',
             'X-Goog-Api-Key': api_key,
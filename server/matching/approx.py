@@ -0,0 +1,284 @@
+import numpy as np
+
+SEQUENTIAL_BIDDERS = 64 # below this many bidders a round costs more than bidding one at a time
+SCALING_FACTOR = 4 # epsilon shrinks by this factor between auction phases
+
+def _by_row(n_rows, rows, cols, costs):
+    """Sorts edges by row and returns (row pointer, columns, costs) in CSR layout."""
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(n_rows + 1, dtype=np.intp)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order], costs[order]
+
+def greedy_b_matching(n_rows, capacities, rows, cols, costs):
+    """
+    Sorted-edge greedy b-matching: scans the edges from cheapest to most
+    expensive and keeps each one whose row is still free and whose column
+    has capacity left. O(E log E) for the sort plus one pass over the edges,
+    stopping early once no more pairs can be added. There is no bound on how
+    far the cost is from optimal, and it may match fewer rows than possible.
+
+    Args:
+        n_rows (int): Number of rows (riders).
+        capacities (numpy.ndarray): Capacity of each column (seats of each driver).
+        rows (numpy.ndarray): Row of each candidate edge.
+        cols (numpy.ndarray): Column of each candidate edge.
+        costs (numpy.ndarray): Finite cost of each candidate edge.
+
+    Returns:
+        numpy.ndarray: Indices of the chosen edges.
+    """
+    left = capacities.astype(np.intp).tolist()
+    free = [True] * n_rows
+    remaining = min(n_rows, int(capacities.sum()))
+    chosen = []
+    order = np.argsort(costs, kind='stable')
+    for edge, i, j in zip(order.tolist(), rows[order].tolist(), cols[order].tolist()):
+        if remaining == 0:
+            break
+        if free[i] and left[j]:
+            free[i] = False
+            left[j] -= 1
+            remaining -= 1
+            chosen.append(edge)
+    return np.array(chosen, dtype=np.intp)
+
+def auction_b_matching(n_rows, capacities, rows, cols, costs, epsilon, unmatched_cost):
+    """
+    Auction algorithm (Bertsekas) for the min-cost b-matching where every row
+    may also stay unmatched at `unmatched_cost`. Each capacity unit of a
+    column is an object with its own price. Unassigned rows bid for the unit
+    that is cheapest at current prices, raising its price by the bid
+    increment plus epsilon and evicting its holder.
+
+    Bids are made in Jacobi rounds of NumPy passes over the bidders' edges,
+    and one at a time once fewer than SEQUENTIAL_BIDDERS rows are left
+    bidding. epsilon is scaled down by SCALING_FACTOR per phase from about a
+    quarter of `unmatched_cost`, with prices carried over, which keeps
+    bidding wars short. Since rows may stay unmatched, each phase ends with a
+    reverse auction that lets seats left free at a stale price win back a
+    rider or drop their price to zero.
+
+    The result then satisfies epsilon-complementary slackness, so its total
+    cost, unmatched rows counted at `unmatched_cost`, is within
+    n_rows * epsilon of the optimum.
+
+    Args:
+        n_rows (int): Number of rows (riders).
+        capacities (numpy.ndarray): Capacity of each column (seats of each driver).
+        rows (numpy.ndarray): Row of each candidate edge.
+        cols (numpy.ndarray): Column of each candidate edge.
+        costs (numpy.ndarray): Finite cost of each candidate edge, below
+            `unmatched_cost`.
+        epsilon (float): Bid increment of the final phase, in cost units.
+        unmatched_cost (float): Cost of leaving a row unmatched.
+
+    Returns:
+        tuple: (matched rows, their columns, their edge costs) arrays.
+
+    Raises:
+        ValueError: If `epsilon` is not positive, since the auction might then
+            never end.
+    """
+    if epsilon <= 0:
+        raise ValueError("epsilon must be positive")
+    capacities = capacities.astype(np.intp)
+    auction = _Auction(n_rows, capacities, rows, cols, costs, unmatched_cost)
+    phase_epsilon = epsilon
+    while phase_epsilon * SCALING_FACTOR <= unmatched_cost / SCALING_FACTOR:
+        phase_epsilon *= SCALING_FACTOR
+    discount = 0.0
+    while phase_epsilon >= epsilon:
+        auction.forward(phase_epsilon, discount)
+        auction.reverse(phase_epsilon)
+        discount = phase_epsilon
+        phase_epsilon /= SCALING_FACTOR
+
+    matched = np.flatnonzero(auction.unit_of >= 0)
+    return matched, auction.col_of_unit[auction.unit_of[matched]], auction.edge_costs[auction.edge_of[matched]]
+
+class _Auction:
+    """
+    State of `auction_b_matching`: edges by row, and the price and holder of
+    every capacity unit, with the units of each column stored contiguously.
+    """
+    def __init__(self, n_rows, capacities, rows, cols, costs, unmatched_cost):
+        self.indptr, self.edge_cols, self.edge_costs = _by_row(n_rows, rows, cols, costs)
+        self.degree = np.diff(self.indptr)
+        order = np.argsort(cols, kind='stable')
+        self.col_indptr = np.zeros(len(capacities) + 1, dtype=np.intp)
+        np.cumsum(np.bincount(cols, minlength=len(capacities)), out=self.col_indptr[1:])
+        self.col_rows, self.col_costs = rows[order], costs[order]
+        # the row-sorted index of each column-sorted edge, to record the edge a row holds
+        row_order = np.empty(len(rows), dtype=np.intp)
+        row_order[np.argsort(rows, kind='stable')] = np.arange(len(rows))
+        self.col_edges = row_order[order]
+        self.capacities = capacities
+        self.unmatched_cost = unmatched_cost
+        self.first_unit = np.cumsum(capacities) - capacities
+        self.col_of_unit = np.repeat(np.arange(len(capacities)), capacities)
+        self.unit_price = np.zeros(int(capacities.sum()))
+        self.holder = np.full(len(self.unit_price), -1, dtype=np.intp) # row holding each unit, -1 if free
+        self.price = np.where(capacities > 0, 0.0, np.inf) # price of each column's cheapest unit
+        self.next_price = np.where(capacities > 1, 0.0, np.inf) # price of its second cheapest unit
+        self.unit_of = np.full(n_rows, -1, dtype=np.intp) # unit each row holds, -1 if unassigned
+        self.edge_of = np.full(n_rows, -1, dtype=np.intp) # edge each row holds
+
+    def _column_units(self, columns):
+        """Returns the units of `columns`, grouped by column in the given order."""
+        caps = self.capacities[columns]
+        return np.repeat(self.first_unit[columns] - (np.cumsum(caps) - caps), caps) + np.arange(caps.sum())
+
+    def _reprice(self, columns):
+        """Recomputes the two cheapest unit prices of sorted, distinct `columns`."""
+        units = self._column_units(columns)
+        unit_cols = self.col_of_unit[units]
+        order = np.lexsort((self.unit_price[units], unit_cols))
+        prices = self.unit_price[units][order]
+        caps = self.capacities[columns]
+        starts = np.cumsum(caps) - caps
+        self.price[columns] = prices[starts]
+        has_second = caps > 1
+        self.next_price[columns[has_second]] = prices[starts[has_second] + 1]
+
+    def _bid_values(self, bidders):
+        """
+        Returns each bidder's best edge and its value and the value of the
+        best alternative, at current prices.
+        """
+        counts = self.degree[bidders]
+        seg_starts = np.cumsum(counts) - counts
+        seg = np.repeat(np.arange(len(bidders)), counts)
+        edges = np.repeat(self.indptr[bidders] - seg_starts, counts) + np.arange(counts.sum())
+        values = -self.edge_costs[edges] - self.price[self.edge_cols[edges]]
+        best_value = np.maximum.reduceat(values, seg_starts)
+        ties = np.flatnonzero(values == best_value[seg])
+        best = ties[np.r_[True, seg[ties][1:] != seg[ties][:-1]]] # first best edge of each bidder
+        best_edge = edges[best]
+        # the best alternative: another column, another unit of the same one, or staying unmatched
+        values[best] = -np.inf
+        second = np.maximum(np.maximum.reduceat(values, seg_starts),
+                            -self.edge_costs[best_edge] - self.next_price[self.edge_cols[best_edge]])
+        return best_edge, best_value, np.maximum(second, -self.unmatched_cost)
+
+    def forward(self, epsilon, discount=0.0):
+        """
+        Runs one phase of bidding, starting with every row unassigned. Any
+        prices are a valid start then; they are first lowered by `discount`,
+        the previous phase's epsilon, which its winners may have overpaid
+        relative to staying unmatched.
+        """
+        if discount:
+            np.maximum(self.unit_price - discount, 0.0, out=self.unit_price)
+            self._reprice(np.flatnonzero(self.capacities > 0))
+        self.holder[:] = -1
+        self.unit_of[:] = -1
+        self.edge_of[:] = -1
+        bidders = np.flatnonzero(self.degree > 0)
+        while len(bidders) >= SEQUENTIAL_BIDDERS:
+            best_edge, best_value, second = self._bid_values(bidders)
+            # the rest would rather stay unmatched, for good since prices only rise
+            stay = best_value >= -self.unmatched_cost
+            bidders, best_edge = bidders[stay], best_edge[stay]
+            j = self.edge_cols[best_edge]
+            bids = self.price[j] + best_value[stay] - second[stay] + epsilon
+
+            # in each column, the k-th highest bid takes the k-th cheapest unit if it pays more for it
+            targets = np.unique(j)
+            units = self._column_units(targets)
+            units = units[np.lexsort((self.unit_price[units], self.col_of_unit[units]))]
+            unit_start = np.r_[0, np.cumsum(self.capacities[targets])[:-1]]
+            order = np.lexsort((-bids, j))
+            bidders, best_edge, j, bids = bidders[order], best_edge[order], j[order], bids[order]
+            group_start = np.flatnonzero(np.r_[True, j[1:] != j[:-1]])
+            rank = np.arange(len(j)) - np.repeat(group_start, np.diff(np.r_[group_start, len(j)]))
+            slot = np.searchsorted(targets, j)
+            win = rank < self.capacities[j]
+            taken = np.full(len(j), -1, dtype=np.intp)
+            taken[win] = units[unit_start[slot[win]] + rank[win]]
+            win[win] = bids[win] > self.unit_price[taken[win]]
+
+            taken = taken[win]
+            evicted = self.holder[taken]
+            evicted = evicted[evicted >= 0]
+            self.unit_of[evicted] = -1
+            winners = bidders[win]
+            self.holder[taken] = winners
+            self.unit_price[taken] = bids[win]
+            self.unit_of[winners] = taken
+            self.edge_of[winners] = best_edge[win]
+            self._reprice(targets)
+            bidders = np.sort(np.concatenate((bidders[~win], evicted)))
+
+        # the last few bidding wars go one bid at a time, without per-round overhead
+        queue = bidders.tolist()
+        while queue:
+            i = queue.pop()
+            best_edge, best_value, second = self._bid_value(i)
+            if best_value < -self.unmatched_cost:
+                continue
+            j = self.edge_cols[best_edge]
+            units = slice(self.first_unit[j], self.first_unit[j] + self.capacities[j])
+            unit = self.first_unit[j] + int(np.argmin(self.unit_price[units]))
+            evicted = self.holder[unit]
+            if evicted >= 0:
+                self.unit_of[evicted] = -1
+                queue.append(int(evicted))
+            self.holder[unit] = i
+            self.unit_price[unit] = self.price[j] + best_value - second + epsilon
+            self.unit_of[i], self.edge_of[i] = unit, best_edge
+            if self.capacities[j] > 1:
+                self.price[j], self.next_price[j] = np.partition(self.unit_price[units], 1)[:2]
+            else:
+                self.price[j] = self.unit_price[unit]
+
+    def _bid_value(self, i):
+        """`_bid_values` for a single bidder."""
+        start, end = self.indptr[i], self.indptr[i + 1]
+        values = -self.edge_costs[start:end] - self.price[self.edge_cols[start:end]]
+        best = int(np.argmax(values))
+        best_value = values[best]
+        second = max(-self.unmatched_cost, -self.edge_costs[start + best] - self.next_price[self.edge_cols[start + best]])
+        if end - start > 1:
+            values[best] = -np.inf
+            second = max(second, values.max())
+        return start + best, best_value, second
+
+    def reverse(self, epsilon):
+        """
+        Reverse auction over the units left free with a positive price: a
+        free unit wins the row that gains most from taking it, if that gain
+        is at least epsilon, and otherwise its price drops to zero. Rows that
+        switch free their previous unit, which is then processed in turn.
+        Every switch raises the row's profit by at least epsilon, so this
+        ends.
+        """
+        col_indptr, col_rows, col_costs, col_edges = self.col_indptr, self.col_rows, self.col_costs, self.col_edges
+        assigned = self.unit_of >= 0
+        profit = np.full(len(self.unit_of), -self.unmatched_cost)
+        profit[assigned] = -self.edge_costs[self.edge_of[assigned]] - self.unit_price[self.unit_of[assigned]]
+        stack = np.flatnonzero((self.holder < 0) & (self.unit_price > 0)).tolist()
+        while stack:
+            unit = stack.pop()
+            j = self.col_of_unit[unit]
+            start, end = col_indptr[j], col_indptr[j + 1]
+            if start == end:
+                self.unit_price[unit] = 0.0
+                continue
+            gains = -col_costs[start:end] - profit[col_rows[start:end]]
+            best = int(np.argmax(gains))
+            if gains[best] < epsilon:
+                self.unit_price[unit] = 0.0
+                continue
+            gains[best] = -np.inf
+            second = gains.max() if end - start > 1 else -np.inf
+            i = col_rows[start + best]
+            previous = self.unit_of[i]
+            if previous >= 0:
+                self.holder[previous] = -1
+                if self.unit_price[previous] > 0:
+                    stack.append(int(previous))
+            self.unit_price[unit] = max(0.0, second - epsilon)
+            self.holder[unit] = i
+            self.unit_of[i], self.edge_of[i] = unit, col_edges[start + best]
+            profit[i] = -col_costs[start + best] - self.unit_price[unit]
@@ -0,0 +1,106 @@
+import numpy as np
+import resource
+import tracemalloc
+from time import perf_counter
+from match import Matcher, DriverNode, RiderNode
+from workload import generate_workload
+
+MAX_ASSIGN_CELLS = 25_000_000 # riders x seats above which the dense assignment problem is skipped
+
+def workload_matcher(workload, **matcher_kwargs):
+    """
+    Returns a Matcher that knows the workload's places and synthetic matrix,
+    so nodes can be added without calling the Routes API.
+    """
+    matcher = Matcher(**matcher_kwargs)
+    matcher.locations = workload['places']
+    matcher.matrix.set(workload['distances'], workload['durations'])
+    return matcher
+
+def _measure(results, name, ops, fn, trace_memory):
+    if trace_memory:
+        tracemalloc.start()
+    start = perf_counter()
+    fn()
+    seconds = perf_counter() - start
+    result = {'ops': ops, 'seconds': seconds, 'ops_per_second': ops / seconds if seconds else float('inf')}
+    if trace_memory:
+        result['peak_mib'] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    results[name] = result
+
+def run_benchmark(n_offers=1000, n_requests=1000, departure_window=3600, max_detour=None, n_listings=5,
+                  n_cost_pairs=10000, trace_memory=False, seed=0, **workload_kwargs):
+    """
+    Times the matching pipeline on a synthetic workload: adding every offer
+    and request, `calc_cost` on random pairs, `sort_listings` for every
+    rider and the global `assign_seats` and `assign`.
+
+    Args:
+        n_offers (int, optional): Number of ride offers.
+        n_requests (int, optional): Number of ride requests.
+        departure_window (float, optional): Matcher departure window in seconds.
+        max_detour (float, optional): Matcher max_detour in minutes.
+        n_listings (int, optional): `n` passed to `sort_listings`.
+        n_cost_pairs (int, optional): Random rider/driver pairs passed to `calc_cost`.
+        trace_memory (bool, optional): If True, reports each stage's peak
+            Python allocations with tracemalloc, which slows the stages down.
+        seed (int, optional): Random seed.
+        **workload_kwargs: Passed to `generate_workload`.
+
+    Returns:
+        dict: Stage name -> {'ops', 'seconds', 'ops_per_second'} plus
+            'peak_mib' when tracing memory, and 'edges' and 'max_rss_mib'
+            for the whole run. Stages that are too large to run are left out.
+    """
+    workload = generate_workload(n_offers, n_requests, seed=seed, **workload_kwargs)
+    matcher = workload_matcher(workload, departure_window=departure_window, max_detour=max_detour)
+    drivers = [DriverNode(offer) for offer in workload['offers']]
+    riders = [RiderNode(request) for request in workload['requests']]
+    results = {}
+
+    def add_drivers():
+        for driver in drivers:
+            matcher.add_driver(driver)
+
+    def add_riders():
+        for rider in riders:
+            matcher.add_rider(rider)
+
+    rng = np.random.default_rng(seed)
+    pairs = [(riders[i], drivers[j]) for i, j in zip(rng.integers(len(riders), size=n_cost_pairs).tolist(),
+                                                     rng.integers(len(drivers), size=n_cost_pairs).tolist())]
+
+    def calc_costs():
+        for rider, driver in pairs:
+            matcher.calc_cost(rider, driver)
+
+    def sort_listings():
+        for rider in riders:
+            matcher.sort_listings(rider, n_listings)
+
+    _measure(results, 'add_driver', len(drivers), add_drivers, trace_memory)
+    _measure(results, 'add_rider', len(riders), add_riders, trace_memory)
+    if drivers and riders:
+        _measure(results, 'calc_cost', n_cost_pairs, calc_costs, trace_memory)
+    _measure(results, 'sort_listings', len(riders), sort_listings, trace_memory)
+    _measure(results, 'assign_seats', 1, matcher.assign_seats, trace_memory)
+    seats = sum(driver.seats for driver in drivers)
+    if len(riders) * seats <= MAX_ASSIGN_CELLS:
+        _measure(results, 'assign', 1, matcher.assign, trace_memory)
+
+    results['edges'] = matcher.graph.n_edges - matcher.graph.n_dead
+    # ru_maxrss is in KiB on Linux
+    results['max_rss_mib'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return results
+
+if __name__ == "__main__":
+    for n in [1000, 10000, 100000]:
+        # spread larger workloads over more days, keeping the nodes per departure window steady
+        days = max(1, n // 1000)
+        print(f"{n} offers x {n} requests over {days} days:")
+        for name, value in run_benchmark(n, n, days=days).items():
+            if isinstance(value, dict):
+                print(f"  {name}: {value['ops_per_second']:.0f}/s ({value['seconds']:.3f}s)")
+            else:
+                print(f"  {name}: {value:.0f}")
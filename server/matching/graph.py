@@ -0,0 +1,209 @@
+import numpy as np
+from array import array
+
+class MatchGraph:
+    """
+    Bipartite driver/rider graph stored compactly. Nodes get integer IDs
+    (`node.id`), edges live in parallel NumPy arrays (driver ID, rider ID,
+    total cost, excess travel time, alive flag), and each node's adjacency is
+    a packed int32 `array` of edge IDs, about 33 bytes per edge in total.
+
+    Removing a node only clears the alive flag of its edges; neighbours drop
+    dead edge IDs the next time their adjacency is read, and the edge arrays
+    are compacted once more than half of them are dead.
+    """
+    MIN_CAPACITY = 1024
+
+    def __init__(self):
+        self.nodes = [] # node ID -> node, None for a free ID
+        self._adjacency = [] # node ID -> array('i') of edge IDs, possibly including dead ones
+        self._free_ids = []
+        self.drivers = {} # DriverNodes in insertion order, used as an ordered set
+        self.riders = {} # RiderNodes in insertion order, used as an ordered set
+        self.n_edges = 0 # edge IDs in use, alive or dead
+        self.n_dead = 0
+        self._allocate(self.MIN_CAPACITY)
+
+    def _allocate(self, capacity):
+        n = self.n_edges
+        arrays = {
+            'edge_driver': np.int32, 'edge_rider': np.int32,
+            'edge_total': np.float64, 'edge_excess': np.float64, 'edge_alive': np.bool_,
+        }
+        for name, dtype in arrays.items():
+            grown = np.zeros(capacity, dtype=dtype)
+            if n:
+                grown[:n] = getattr(self, name)[:n]
+            setattr(self, name, grown)
+
+    def __contains__(self, node):
+        return node in self.drivers or node in self.riders
+
+    def __len__(self):
+        return len(self.drivers) + len(self.riders)
+
+    def add_node(self, node, is_driver):
+        """
+        Registers a node without edges and assigns its integer ID.
+        """
+        if node in self:
+            return
+        if self._free_ids:
+            node.id = self._free_ids.pop()
+            self.nodes[node.id] = node
+            self._adjacency[node.id] = array('i')
+        else:
+            node.id = len(self.nodes)
+            self.nodes.append(node)
+            self._adjacency.append(array('i'))
+        (self.drivers if is_driver else self.riders)[node] = None
+
+    def add_edges(self, node, neighbours, total, excess):
+        """
+        Adds edges from `node` to each of `neighbours` with the given costs.
+
+        Args:
+            node (Node): A registered node.
+            neighbours (list): Registered nodes on the other side.
+            total (numpy.ndarray): Total cost of each edge.
+            excess (numpy.ndarray): Excess travel time of each edge.
+        """
+        k = len(neighbours)
+        if k == 0:
+            return
+        n = self.n_edges
+        if n + k > len(self.edge_alive):
+            self._allocate(max(n + k, 2 * len(self.edge_alive)))
+
+        neighbour_ids = np.fromiter((neighbour.id for neighbour in neighbours), dtype=np.int32, count=k)
+        if node in self.drivers:
+            self.edge_driver[n:n + k] = node.id
+            self.edge_rider[n:n + k] = neighbour_ids
+        else:
+            self.edge_driver[n:n + k] = neighbour_ids
+            self.edge_rider[n:n + k] = node.id
+        self.edge_total[n:n + k] = total
+        self.edge_excess[n:n + k] = excess
+        self.edge_alive[n:n + k] = True
+        self.n_edges = n + k
+
+        self._adjacency[node.id].extend(range(n, n + k))
+        adjacency = self._adjacency
+        for edge, neighbour_id in zip(range(n, n + k), neighbour_ids.tolist()):
+            adjacency[neighbour_id].append(edge)
+
+    def add_edge_arrays(self, driver_ids, rider_ids, total, excess):
+        """
+        Bulk-adds edges between registered nodes given by their IDs, e.g. when 
+        restoring a snapshot, building each node's adjacency in one pass.
+        """
+        k = len(driver_ids)
+        if k == 0:
+            return
+        n = self.n_edges
+        if n + k > len(self.edge_alive):
+            self._allocate(max(n + k, 2 * len(self.edge_alive)))
+        self.edge_driver[n:n + k] = driver_ids
+        self.edge_rider[n:n + k] = rider_ids
+        self.edge_total[n:n + k] = total
+        self.edge_excess[n:n + k] = excess
+        self.edge_alive[n:n + k] = True
+        self.n_edges = n + k
+
+        edge_ids = np.arange(n, n + k, dtype=np.int32)
+        for node_ids in (np.asarray(driver_ids), np.asarray(rider_ids)):
+            order = np.argsort(node_ids, kind='stable')
+            grouped = node_ids[order]
+            starts = np.flatnonzero(np.r_[True, grouped[1:] != grouped[:-1]])
+            for node_id, chunk in zip(grouped[starts].tolist(), np.split(edge_ids[order], starts[1:])):
+                self._adjacency[node_id].frombytes(chunk.tobytes())
+
+    def edges(self, node):
+        """
+        Returns:
+            tuple: (edge IDs, neighbour IDs, totals, excesses) arrays of the
+                node's live edges.
+        """
+        edge_ids = self._live_edges(node.id)
+        neighbours = self.edge_rider if node in self.drivers else self.edge_driver
+        return edge_ids, neighbours[edge_ids], self.edge_total[edge_ids], self.edge_excess[edge_ids]
+
+    def edge_list(self, node):
+        """
+        Returns:
+            list: (neighbour node, (total, excess)) tuples of the node's edges.
+        """
+        _, neighbour_ids, total, excess = self.edges(node)
+        nodes = self.nodes
+        return [(nodes[i], cost) for i, cost in zip(neighbour_ids.tolist(), zip(total.tolist(), excess.tolist()))]
+
+    def degree(self, node):
+        return len(self._live_edges(node.id))
+
+    def _live_edges(self, node_id):
+        adjacency = self._adjacency[node_id]
+        edge_ids = np.frombuffer(adjacency, dtype=np.int32) if len(adjacency) else np.empty(0, dtype=np.int32)
+        alive = self.edge_alive[edge_ids]
+        if not alive.all():
+            edge_ids = edge_ids[alive]
+            self._adjacency[node_id] = array('i', edge_ids.tobytes())
+        return edge_ids.copy()
+
+    def remove_node(self, node):
+        """
+        Removes a node and its edges.
+
+        Returns:
+            list: The nodes that were its neighbours.
+
+        Raises:
+            KeyError: If the node is not in the graph.
+        """
+        if node not in self:
+            raise KeyError(node)
+        edge_ids, neighbour_ids, _, _ = self.edges(node)
+        if node in self.drivers:
+            del self.drivers[node]
+        else:
+            del self.riders[node]
+        self.edge_alive[edge_ids] = False
+        self.n_dead += len(edge_ids)
+
+        self.nodes[node.id] = None
+        self._adjacency[node.id] = array('i')
+        self._free_ids.append(node.id)
+        node.id = -1 # the ID may be reused by another node
+        neighbours = [self.nodes[i] for i in neighbour_ids.tolist()]
+
+        if self.n_dead > self.n_edges // 2 and self.n_edges > self.MIN_CAPACITY:
+            self.compact()
+        return neighbours
+
+    def compact(self):
+        """
+        Drops dead edges from the edge arrays and renumbers the live ones.
+        """
+        n = self.n_edges
+        alive = self.edge_alive[:n].copy()
+        new_ids = np.cumsum(alive, dtype=np.int64) - 1
+        for name in ('edge_driver', 'edge_rider', 'edge_total', 'edge_excess', 'edge_alive'):
+            values = getattr(self, name)
+            live = values[:n][alive]
+            values[:len(live)] = live
+            values[len(live):n] = 0
+        self.n_edges = int(alive.sum())
+        self.n_dead = 0
+        for node_id, adjacency in enumerate(self._adjacency):
+            if len(adjacency):
+                edge_ids = np.frombuffer(adjacency, dtype=np.int32)
+                edge_ids = edge_ids[alive[edge_ids]]
+                self._adjacency[node_id] = array('i', new_ids[edge_ids].astype(np.int32).tobytes())
+
+    def nbytes(self):
+        """
+        Returns:
+            int: Approximate bytes used by the edge arrays and adjacency lists.
+        """
+        arrays = sum(getattr(self, name).nbytes for name in
+                     ('edge_driver', 'edge_rider', 'edge_total', 'edge_excess', 'edge_alive'))
+        return arrays + sum(adjacency.buffer_info()[1] * adjacency.itemsize for adjacency in self._adjacency)
@@ -1,36 +1,293 @@
 import numpy as np
 from collections import defaultdict
 from heapq import nsmallest
-from dotenv import load_dotenv
+from bisect import bisect_left, bisect_right
+from itertools import count
 import os
+import pickle
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
 from pprint import pprint
 from sample_data import ride_offers1, ride_requests1, ride_offers2, ride_requests2
-import requests
 import json
 from scipy.optimize import linear_sum_assignment
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+from lap import LAPSolver
+from approx import greedy_b_matching, auction_b_matching
+from travel_matrix import TravelMatrix, TimeSlicedMatrix, UNKNOWN, NOT_FETCHED
+from travel_cache import TravelTimeCache, ANY_DEPARTURE
+from graph import MatchGraph
+from providers import GoogleRoutesProvider
 
-load_dotenv()
-GOOGLE_API_KEY = os.getenv("REACT_APP_GOOGLE_MAPS_API_KEY")
+INFEASIBLE_COST = 1e9 # stands in for pairs that must not be matched in assignment problems
+UNMATCHED_COST = 24 * 60 # minutes an unmatched rider counts as in approximate matching
+
+def departure_timestamp(data):
+    """
+    Returns the departure time in a ride offer/request as a POSIX timestamp, 
+    or None if it has none. Accepts datetimes and ISO 8601 strings such as 
+    "2025-04-19T08:00:00".
+    """
+    departure_time = data.get('departure_time')
+    if departure_time is None:
+        return None
+    if isinstance(departure_time, str):
+        departure_time = datetime.fromisoformat(departure_time)
+    return departure_time.timestamp()
 
 class Node:
+    """
+    A ride offer or request in the matching graph. Besides the caller's `data` 
+    dict, a node keeps only the fields matching reads, in slots.
+    """
+    __slots__ = ('data', 'id', 'origin', 'destination', 'departure', 'seats', 'max_excess')
+
     def __init__(self, data):
         self.data = data
+        self.id = -1 # integer ID in the Matcher's graph
+        self.origin = data.get('origin')
+        self.destination = data.get('destination')
+        self.departure = departure_timestamp(data)
+        self.seats = max(int(data.get('available_seats', 1)), 0)
+        self.max_excess = data.get('max_excess') # a rider's own limit on the driver's excess travel time in minutes
 
 class DriverNode(Node):
-    def __init__(self, data):
-        super().__init__(data)
+    __slots__ = ()
 
 class RiderNode(Node):
-    def __init__(self, data):
-        super().__init__(data)
+    __slots__ = ()
 
-class Matcher:
+class _EdgeView:
+    """
+    Read-only dict-like view of one side of a `MatchGraph`, mapping each node 
+    to the set of its (neighbour, (total, excess)) edges.
+    """
+    def __init__(self, graph, nodes):
+        self._graph = graph
+        self._nodes = nodes
+
+    def __contains__(self, node):
+        return node in self._nodes
+
+    def __iter__(self):
+        return iter(list(self._nodes))
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def keys(self):
+        return list(self._nodes)
+
+    def __getitem__(self, node):
+        if node not in self._nodes:
+            raise KeyError(node)
+        return set(self._graph.edge_list(node))
+
+class DepartureIndex:
+    """
+    Nodes sorted by departure time, so the nodes leaving within a window of 
+    a given time are found with binary search. Nodes without a departure 
+    time are compatible with every window.
+    """
     def __init__(self):
-        self._graph = defaultdict(set) # key is DriverNode, values are RiderNode
-        self._revgraph = defaultdict(set) # key is RiderNode, values are DriverNode 
-        self.locations = [] # stored as place_ids
-        self.distance_matrix = None # stores both distance in meters and duration in seconds between locations
-                                    # this is a symmetric matrix
+        self._keys = [] # sorted (timestamp, sequence number) pairs
+        self._nodes = [] # node for each key
+        self._node_keys = {} # node -> its key
+        self._untimed = {} # nodes without a departure time, used as an ordered set
+        self._counter = count()
+
+    def __len__(self):
+        return len(self._nodes) + len(self._untimed)
+
+    def add(self, node):
+        if node in self._node_keys or node in self._untimed:
+            return
+        timestamp = node.departure
+        if timestamp is None:
+            self._untimed[node] = None
+            return
+        key = (timestamp, next(self._counter))
+        pos = bisect_right(self._keys, key)
+        self._keys.insert(pos, key)
+        self._nodes.insert(pos, node)
+        self._node_keys[node] = key
+
+    def remove(self, node):
+        if node in self._untimed:
+            del self._untimed[node]
+            return
+        key = self._node_keys.pop(node, None)
+        if key is None:
+            return
+        pos = bisect_left(self._keys, key)
+        del self._keys[pos]
+        del self._nodes[pos]
+
+    def window(self, timestamp, width):
+        """
+        Returns the nodes departing within `width` seconds of `timestamp`, 
+        plus the nodes without a departure time. With no timestamp or width, 
+        returns every node.
+        """
+        if timestamp is None or width is None:
+            return self._nodes + list(self._untimed)
+        start = bisect_left(self._keys, (timestamp - width, -1))
+        end = bisect_right(self._keys, (timestamp + width, float('inf')))
+        return self._nodes[start:end] + list(self._untimed)
+
+    def before(self, timestamp):
+        """
+        Returns the nodes departing strictly before `timestamp`.
+        """
+        return self._nodes[:bisect_left(self._keys, (timestamp, -1))]
+
+class TopK:
+    """
+    A node's k cheapest edges, kept sorted by total cost as edges are added 
+    and removed. Removing a listed edge marks the list stale, and it is 
+    rebuilt from the node's full edge set on the next query.
+    """
+    _counter = count() # tie-breaker so entries never compare nodes
+
+    def __init__(self, k):
+        self.k = k
+        self._entries = [] # sorted (total, sequence number, neighbour, cost)
+        self.stale = False
+
+    def add(self, neighbour, cost):
+        if len(self._entries) == self.k and cost[0] >= self._entries[-1][0]:
+            return
+        entry = (cost[0], next(self._counter), neighbour, cost)
+        self._entries.insert(bisect_right(self._entries, entry), entry)
+        del self._entries[self.k:]
+
+    def remove(self, neighbour):
+        for pos, entry in enumerate(self._entries):
+            if entry[2] is neighbour:
+                del self._entries[pos]
+                self.stale = True
+                return
+
+    def rebuild(self, edges):
+        self._entries = []
+        self.stale = False
+        for neighbour, cost in nsmallest(self.k, edges, key=lambda x: x[1][0]):
+            self.add(neighbour, cost)
+
+    def items(self, n):
+        return [(neighbour, cost) for _, _, neighbour, cost in self._entries[:n]]
+
+class Matcher:
+    def __init__(self, max_excess=None, batch_size=1, flush_interval=None, cache=None, departure_window=None,
+                 top_k=10, provider=None, time_slices=None, max_detour=None):
+        self.graph = MatchGraph() # driver/rider edges with (total, excess) costs
+        self._locations = [] # stored as place_ids, position is the matrix index
+        self._location_index = {} # place_id -> position in _locations
+        self._location_refs = defaultdict(int) # place_id -> number of endpoints of graph nodes at it
+        self._node_locations = set() # locations flush added for queued nodes; the only ones ever collected
+        self._released = set() # node locations whose last node was removed, dropped by compact_locations
+        self.matrix = TravelMatrix() # distances in meters and durations in seconds, [origin][destination]
+        self._lap_solver = LAPSolver() # keeps duals between assign(warm_start=True) calls
+        self.max_excess = max_excess # largest excess travel time in minutes a driver accepts, None for no limit
+        self.matching = {} # maintained maximal matching, key is RiderNode, value is DriverNode
+        self._matched_riders = defaultdict(set) # key is DriverNode, values are its matched RiderNodes
+        self.batch_size = batch_size # queued nodes that trigger a flush in add_with_location
+        self.flush_interval = flush_interval # seconds after which add_with_location flushes the queue, None to disable
+        self._pending_nodes = [] # nodes queued by add_with_location, waiting for their locations' routes
+        self._last_flush = time.monotonic()
+        self.provider = provider or GoogleRoutesProvider() # TravelTimeProvider the matrix is filled from
+        self.cache = cache # optional TravelTimeCache consulted before calling the provider
+        self.departure_window = departure_window # seconds between departures for a pair to get an edge, None for no limit
+        self._drivers_by_time = DepartureIndex()
+        self._riders_by_time = DepartureIndex()
+        self.top_k = top_k # cheapest edges kept ready per node for sort_listings
+        self._top = {} # key is a DriverNode or RiderNode, value is the TopK of its edges
+        self._routes = {} # key is DriverNode, value is its confirmed stops as (RiderNode, is_pickup) tuples
+        self._route_of = {} # key is a RiderNode on a confirmed route, value is its DriverNode
+        # departure-hour travel matrices, at most `time_slices` loaded at once; None costs every hour with `matrix`
+        self.time_slices = TimeSlicedMatrix(time_slices) if time_slices else None
+        self.max_detour = max_detour # largest excess travel time in minutes of a pair stored as an edge, None to store all
+
+    @property
+    def _graph(self):
+        """Drivers mapped to their (rider, (total, excess)) edges, built on access."""
+        return _EdgeView(self.graph, self.graph.drivers)
+
+    @property
+    def _revgraph(self):
+        """Riders mapped to their (driver, (total, excess)) edges, built on access."""
+        return _EdgeView(self.graph, self.graph.riders)
+
+    @property
+    def locations(self):
+        """
+        The place IDs known to the matcher, in matrix index order. Treat the 
+        list as read-only; use `add_location` or assign a new list so the 
+        place ID index stays in sync.
+        """
+        return self._locations
+
+    @locations.setter
+    def locations(self, locations):
+        self._locations = list(locations)
+        self._location_index = {loc: i for i, loc in enumerate(self._locations)}
+        self._node_locations.intersection_update(self._location_index)
+
+    def location_index(self, location):
+        """
+        Returns the matrix index of a place ID in O(1).
+
+        Raises:
+            KeyError: If the location has not been added.
+        """
+        return self._location_index[location]
+
+    def _append_location(self, location):
+        self._location_index[location] = len(self._locations)
+        self._locations.append(location)
+
+    @property
+    def distances(self):
+        """int32 view of distances in meters, distances[origin][destination]; unknown entries hold UNKNOWN."""
+        return self.matrix.distances
+
+    @property
+    def durations(self):
+        """int32 view of durations in seconds, durations[origin][destination]; unknown entries hold UNKNOWN."""
+        return self.matrix.durations
+
+    @property
+    def distance_matrix(self):
+        """
+        Combined (distance, duration) view of the travel matrices.
+
+        Returns:
+            numpy.ndarray or None: An (n, n, 2) int32 array where `[i][j]` is 
+                (distance in meters, duration in seconds) from location i to 
+                location j, or None if no matrix has been computed yet. This is 
+                a copy; write through `matrix` instead.
+        """
+        distances, durations = self.matrix.view()
+        if distances.shape[0] == 0:
+            return None
+        return np.stack((distances, durations), axis=-1)
+
+    @distance_matrix.setter
+    def distance_matrix(self, matrix):
+        """
+        Sets both travel matrices from an (n, n, 2) array-like of 
+        (distance, duration) pairs, or clears them when given None.
+        """
+        if self.time_slices is not None:
+            self.time_slices.clear()
+        if matrix is None:
+            self.matrix = TravelMatrix()
+            return
+        matrix = np.asarray(matrix, dtype=np.int32)
+        self.matrix.set(matrix[..., 0], matrix[..., 1])
 
     def add_location(self, location, update=False):
         """
@@ -45,14 +302,32 @@ class Matcher:
         Returns:
             None
         """
-        if len(self.locations) == 1:
-            self.locations.append(location)
+        if location in self._location_index:
             return
-        if location not in self.locations:
-            if (update):
-                self.update_distance_matrix(location)
-            self.locations.append(location)
-    
+        if (update):
+            self.update_distance_matrix(location)
+        self._append_location(location)
+
+    def add_locations(self, locations, update=False):
+        """
+        Adds several locations at once. With `update`, the distance matrix is 
+        extended for all new locations with one batch of chunked requests and 
+        a single amortized grow, instead of one of each per location.
+
+        Args:
+            locations (list): The locations to be added. Known locations and 
+                duplicates are skipped.
+            update (bool, optional): If True, updates the distance matrix with 
+                the new locations. Defaults to False.
+        """
+        new_locations = [loc for loc in dict.fromkeys(locations) if loc not in self._location_index]
+        if not new_locations:
+            return
+        if update:
+            self._extend_distance_matrix(new_locations)
+        for location in new_locations:
+            self._append_location(location)
+
     def add_rider(self, node: RiderNode):
         """
         Adds a new rider node to the graph and establishes connections with existing drivers.
@@ -61,23 +336,30 @@ class Matcher:
             node (RiderNode): The rider node to be added to the graph.
 
         Behavior:
-            - For each driver in the graph, calculates the cost between the driver and the new rider.
-            - Updates the graph (`_graph`) by adding the rider node and the calculated cost to the driver's adjacency list.
-            - Updates the reverse graph (`_revgraph`) by adding the driver and the calculated cost to the rider's adjacency list.
+            - For each driver departing within `departure_window` of the rider (found by binary 
+              search over the drivers' departure times), calculates the cost between the driver 
+              and the new rider.
+            - Stores an edge with the calculated cost between the rider and each of those drivers 
+              in `graph`, and updates both sides' top-k listings.
+            - Matches the rider to its cheapest feasible driver with a free seat, if any.
 
         Note:
-            The `calc_cost` method is used to compute the cost between the rider and the driver.
-            Ensure that the `calc_cost` method is implemented with the appropriate logic for cost calculation.
+            Costs are computed with `compute_cost_matrix`, which matches `calc_cost` for each pair.
         """
-        # Ensure the driver is added to the graph even if there are no riders
-        if node not in self._graph:
-            self._revgraph[node] = set()
+        if node in self.graph:
+            return
+        self.graph.add_node(node, is_driver=False)
+        self._retain_locations(node)
+        self._top[node] = TopK(self.top_k)
+        self._riders_by_time.add(node)
+        drivers = self._drivers_by_time.window(node.departure, self.departure_window)
+        if not drivers:
+            return
 
-        for driver in self._graph.keys():
-            # Calculate cost between the driver and the new rider
-            cost = self.calc_cost(node, driver)  # Replace with actual cost calculation logic
-            self._graph[driver].add((node, cost))
-            self._revgraph[node].add((driver, cost))
+        # Calculate costs between the new rider and every compatible driver in one pass
+        drivers, total, excess = self._candidate_edges(node, drivers)
+        self._add_edges(node, drivers, total, excess)
+        self._match_rider(node)
 
     def add_driver(self, node: DriverNode):
         """
@@ -85,39 +367,428 @@ class Matcher:
         and existing riders.
         This method ensures that the driver node is added to the graph even if 
         there are no riders. It also computes the cost between the new driver 
-        and all existing riders, updating both the forward graph (`_graph`) 
-        and the reverse graph (`_revgraph`) with the calculated costs.
+        and the existing riders departing within `departure_window` of it, 
+        storing an edge with the calculated cost for each of them in `graph`.
         Args:
             node (DriverNode): The driver node to be added to the graph.
         Side Effects:
-            - Updates `_graph` to include the driver node and its connections 
-              to riders with associated costs.
-            - Updates `_revgraph` to include connections from riders to the 
-              driver node with associated costs.
-        """
-        # Ensure the driver is added to the graph even if there are no riders
-        if node not in self._graph:
-            self._graph[node] = set()
-        
-        # Calculate costs between the new driver and existing riders
-        for rider in self._revgraph.keys():
-            cost = self.calc_cost(rider, node)  # Calculate cost between rider and driver
-            self._graph[node].add((rider, cost))
-            self._revgraph[rider].add((node, cost))
+            - Adds the driver and its edges to `graph`.
+            - Updates the top-k listings of the driver and its riders.
+            - Fills the driver's seats with the cheapest feasible unmatched riders.
+        """
+        if node in self.graph:
+            return
+        self.graph.add_node(node, is_driver=True)
+        self._retain_locations(node)
+        self._top[node] = TopK(self.top_k)
+        self._drivers_by_time.add(node)
+        riders = self._riders_by_time.window(node.departure, self.departure_window)
+        if not riders:
+            return
+
+        # Calculate costs between the new driver and compatible riders in one pass
+        riders, total, excess = self._candidate_edges(node, riders)
+        self._add_edges(node, riders, total, excess)
+        self._fill_seats(node)
+
+    def _candidate_edges(self, node, neighbours):
+        """
+        Costs a new node against its candidate neighbours on the other side. 
+        With `max_detour` set, pairs whose driver would travel more than 
+        `max_detour` extra minutes are left out. Most are ruled out before 
+        exact costing by a lower bound on the excess travel time that needs 
+        one pairwise lookup instead of two:
+
+            excess >= driver src -> rider src + rider src -> rider dest - driver src -> driver dest
+
+        which only drops the nonnegative rider dest -> driver dest leg, so it 
+        holds for any matrix. With `time_slices`, only the exact check is done.
+
+        Returns:
+            tuple: (neighbours, total, excess) of the pairs to store as edges, 
+                the costs as 1-d arrays aligned with the neighbours.
+        """
+        is_rider = node in self.graph.riders
+        riders, drivers = ([node], neighbours) if is_rider else (neighbours, [node])
+        if self.max_detour is None or self.time_slices is not None:
+            _, _, total, excess = self.compute_cost_matrix(riders, drivers)
+            total, excess = total.ravel(), excess.ravel()
+        else:
+            rider_src, rider_dest = self._node_indices(riders)
+            driver_src, driver_dest = self._node_indices(drivers)
+            durations = self.durations
+            to_pickup = durations[driver_src[None, :], rider_src[:, None]].ravel()
+            trip = durations[rider_src, rider_dest]
+            direct = durations[driver_src, driver_dest]
+            bound = (to_pickup + trip - direct) / 60
+            unknown = (to_pickup == UNKNOWN) | (trip == UNKNOWN) | (direct == UNKNOWN)
+            keep = np.flatnonzero((bound <= self.max_detour) & ~unknown)
+            if is_rider:
+                driver_src, driver_dest = driver_src[keep], driver_dest[keep]
+            else:
+                rider_src, rider_dest = rider_src[keep], rider_dest[keep]
+            total, excess = self._cost_block(durations, rider_src, rider_dest, driver_src, driver_dest)
+            total, excess = total.ravel(), excess.ravel()
+            neighbours = [neighbours[i] for i in keep.tolist()]
+
+        if self.max_detour is not None:
+            keep = np.flatnonzero(excess <= self.max_detour)
+            if len(keep) < len(neighbours):
+                neighbours = [neighbours[i] for i in keep.tolist()]
+                total, excess = total[keep], excess[keep]
+        return neighbours, total, excess
+
+    def _add_edges(self, node, neighbours, total, excess):
+        """
+        Stores edges from a new node to its neighbours and updates the top-k 
+        listings on both sides.
+        """
+        self.graph.add_edges(node, neighbours, total, excess)
+        top = self._top[node]
+        for i in np.argsort(total, kind='stable')[:top.k].tolist():
+            top.add(neighbours[i], (float(total[i]), float(excess[i])))
+        tops = self._top
+        for neighbour, cost in zip(neighbours, zip(total.tolist(), excess.tolist())):
+            tops[neighbour].add(node, cost)
+
+    def remove_rider(self, node: RiderNode):
+        """
+        Removes a rider and its edges from the graph in O(degree). If the rider 
+        was matched, the freed seat is offered to the driver's cheapest 
+        feasible unmatched rider.
+
+        Args:
+            node (RiderNode): The rider node to be removed.
+
+        Raises:
+            KeyError: If the rider is neither in the graph nor queued by 
+                `add_with_location`.
+        """
+        if node not in self.graph.riders:
+            if node not in self._pending_nodes:
+                raise KeyError(node)
+            # still waiting for its locations' routes; cancel it before it is added
+            self._pending_nodes.remove(node)
+            return
+        for driver in self.graph.remove_node(node):
+            self._top[driver].remove(node)
+        del self._top[node]
+        self._riders_by_time.remove(node)
+
+        driver = self.matching.pop(node, None)
+        if driver is not None:
+            self._matched_riders[driver].discard(node)
+            self._fill_seats(driver)
+        driver = self._route_of.pop(node, None)
+        if driver is not None:
+            self._routes[driver] = [stop for stop in self._routes[driver] if stop[0] is not node]
+        self._release_locations(node)
+
+    def remove_driver(self, node: DriverNode):
+        """
+        Removes a driver and its edges from the graph in O(degree). Riders that 
+        were matched to the driver are re-matched to their cheapest feasible 
+        driver with a free seat.
+
+        Args:
+            node (DriverNode): The driver node to be removed.
+
+        Raises:
+            KeyError: If the driver is neither in the graph nor queued by 
+                `add_with_location`.
+        """
+        if node not in self.graph.drivers:
+            if node not in self._pending_nodes:
+                raise KeyError(node)
+            # still waiting for its locations' routes; cancel it before it is added
+            self._pending_nodes.remove(node)
+            return
+        for rider in self.graph.remove_node(node):
+            self._top[rider].remove(node)
+        del self._top[node]
+        self._drivers_by_time.remove(node)
+
+        for rider in self._matched_riders.pop(node, set()):
+            del self.matching[rider]
+            self._match_rider(rider)
+        for rider, is_pickup in self._routes.pop(node, []):
+            if is_pickup:
+                del self._route_of[rider]
+        self._release_locations(node)
+
+    def expire_departed(self, now=None):
+        """
+        Removes every driver and rider whose departure time has passed. Riders 
+        go first so that departing drivers' seats are not refilled with riders 
+        that are about to be removed anyway. Nodes without a departure time 
+        never expire.
+
+        Args:
+            now (float, optional): POSIX timestamp to compare departures with. 
+                Defaults to the current time.
+
+        Returns:
+            list: The removed nodes, riders first.
+        """
+        now = time.time() if now is None else now
+        riders = self._riders_by_time.before(now)
+        drivers = self._drivers_by_time.before(now)
+        for rider in riders:
+            self.remove_rider(rider)
+        for driver in drivers:
+            self.remove_driver(driver)
+        return riders + drivers
+
+    def _retain_locations(self, node):
+        for location in (node.origin, node.destination):
+            self._location_refs[location] += 1
+            self._released.discard(location)
+
+    def _release_locations(self, node):
+        """
+        Drops a removed node's references to its locations. Once more than half 
+        of the known locations are unused, the matrix is compacted, so a 
+        location costs O(n) amortized to collect. Only locations that `flush` 
+        added for its nodes are collected; the ones the caller added stay.
+        """
+        for location in (node.origin, node.destination):
+            self._location_refs[location] -= 1
+            if self._location_refs[location] == 0:
+                del self._location_refs[location]
+                if location in self._node_locations:
+                    self._released.add(location)
+        if len(self._released) > len(self._locations) // 2:
+            self.compact_locations()
+
+    def compact_locations(self):
+        """
+        Forgets the locations that `flush` added for nodes and that no node in 
+        the graph uses any more, and rebuilds the travel matrix without their 
+        rows and columns. Locations added by the caller, e.g. before 
+        `calc_initial_distance_matrix`, are kept.
+        """
+        if not self._released:
+            return
+        keep = [i for i, location in enumerate(self._locations) if location not in self._released]
+        size = self.matrix.size
+        self.matrix.take([i for i in keep if i < size])
+        if self.time_slices is not None:
+            self.time_slices.take(keep)
+        self.locations = [self._locations[i] for i in keep]
+        self._released.clear()
+
+    def save(self, path):
+        """
+        Writes a snapshot of the matcher under the directory `path`: the travel 
+        matrices as raw .npy files, the live edges as an .npz, and the location 
+        table, nodes, matching, routes and settings as a pickle. Each snapshot 
+        goes into a new subdirectory and is published by atomically pointing 
+        the `current` symlink at it, so files that a loaded matcher maps are 
+        never rewritten and a crash mid-save leaves the last snapshot in place. 
+        The snapshot it replaces is kept for matchers still loading it; older 
+        ones are deleted.
+
+        Args:
+            path (str): Directory to write into, created if missing.
+        """
+        os.makedirs(path, exist_ok=True)
+        snapshot = tempfile.mkdtemp(prefix="snapshot-", dir=path)
+        distances, durations = self.matrix.view()
+        np.save(os.path.join(snapshot, "distances.npy"), distances)
+        np.save(os.path.join(snapshot, "durations.npy"), durations)
+
+        # renumber the live nodes 0..n-1, skipping free IDs
+        nodes = [node for node in self.graph.nodes if node is not None]
+        position = np.full(len(self.graph.nodes), -1, dtype=np.int32)
+        position[[node.id for node in nodes]] = np.arange(len(nodes), dtype=np.int32)
+        graph = self.graph
+        alive = np.flatnonzero(graph.edge_alive[:graph.n_edges])
+        np.savez(os.path.join(snapshot, "graph.npz"),
+                 edge_driver=position[graph.edge_driver[alive]], edge_rider=position[graph.edge_rider[alive]],
+                 edge_total=graph.edge_total[alive], edge_excess=graph.edge_excess[alive])
+
+        index = {node: i for i, node in enumerate(nodes)}
+        state = {
+            'settings': {'max_excess': self.max_excess, 'batch_size': self.batch_size,
+                         'flush_interval': self.flush_interval, 'departure_window': self.departure_window,
+                         'top_k': self.top_k,
+                         'time_slices': self.time_slices.max_slices if self.time_slices is not None else None,
+                         'max_detour': self.max_detour},
+            'locations': self._locations,
+            'node_locations': sorted(self._node_locations),
+            'released': sorted(self._released),
+            'nodes': [(node in graph.drivers, node.data) for node in nodes],
+            'matching': [(index[rider], index[driver]) for rider, driver in self.matching.items()],
+            'routes': {index[driver]: [(index[rider], is_pickup) for rider, is_pickup in stops]
+                       for driver, stops in self._routes.items()},
+            'pending': [(isinstance(node, DriverNode), node.data) for node in self._pending_nodes],
+        }
+        with open(os.path.join(snapshot, "state.pkl"), "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        current = os.path.join(path, "current")
+        previous = os.readlink(current) if os.path.islink(current) else None
+        link = snapshot + ".link"
+        os.symlink(os.path.basename(snapshot), link)
+        os.replace(link, current)
+        for name in os.listdir(path):
+            if name.startswith("snapshot-") and name not in (os.path.basename(snapshot), previous):
+                stale = os.path.join(path, name)
+                if os.path.islink(stale): # left by a save that crashed before publishing
+                    os.remove(stale)
+                else:
+                    shutil.rmtree(stale, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, mmap=True, **kwargs):
+        """
+        Restores a matcher written by `save` without recomputing any costs or 
+        calling the provider. With `mmap`, the travel matrices are mapped 
+        read-only straight from their files, so loading is O(1) in the matrix 
+        size and worker processes that load the same snapshot share one copy 
+        in the page cache; the matrix is copied into private memory only when 
+        a new location makes it grow. Top-k listings are rebuilt lazily.
+
+        Only load snapshots from trusted sources, since the state is a pickle.
+
+        Args:
+            path (str): Directory written by `save`; its current snapshot is 
+                loaded.
+            mmap (bool, optional): If False, reads the matrices into memory.
+            **kwargs: Passed to the `Matcher` constructor, overriding the saved 
+                settings; e.g. `provider` and `cache`, which are not saved.
+
+        Returns:
+            Matcher: The restored matcher.
+        """
+        path = os.path.realpath(os.path.join(path, "current"))
+        with open(os.path.join(path, "state.pkl"), "rb") as f:
+            state = pickle.load(f)
+        matcher = cls(**{**state['settings'], **kwargs})
+        mmap_mode = 'r' if mmap else None
+        distances = np.load(os.path.join(path, "distances.npy"), mmap_mode=mmap_mode)
+        durations = np.load(os.path.join(path, "durations.npy"), mmap_mode=mmap_mode)
+        matcher.matrix = TravelMatrix.from_buffers(distances, durations)
+        matcher.locations = state['locations']
+        matcher._node_locations = set(state['node_locations'])
+        matcher._released = set(state['released'])
+
+        nodes = [DriverNode(data) if is_driver else RiderNode(data) for is_driver, data in state['nodes']]
+        for node, (is_driver, _) in zip(nodes, state['nodes']):
+            matcher.graph.add_node(node, is_driver)
+            matcher._retain_locations(node)
+            top = matcher._top[node] = TopK(matcher.top_k)
+            top.stale = True
+        # adding in departure order makes every index insertion an append
+        for node in sorted(nodes, key=lambda node: (node.departure is None, node.departure or 0)):
+            (matcher._drivers_by_time if node in matcher.graph.drivers else matcher._riders_by_time).add(node)
+        with np.load(os.path.join(path, "graph.npz")) as edges:
+            matcher.graph.add_edge_arrays(edges['edge_driver'], edges['edge_rider'],
+                                          edges['edge_total'], edges['edge_excess'])
+
+        for rider, driver in state['matching']:
+            matcher.matching[nodes[rider]] = nodes[driver]
+            matcher._matched_riders[nodes[driver]].add(nodes[rider])
+        for driver, stops in state['routes'].items():
+            matcher._routes[nodes[driver]] = [(nodes[rider], is_pickup) for rider, is_pickup in stops]
+            for rider, is_pickup in stops:
+                if is_pickup:
+                    matcher._route_of[nodes[rider]] = nodes[driver]
+        matcher._pending_nodes = [DriverNode(data) if is_driver else RiderNode(data)
+                                  for is_driver, data in state['pending']]
+        return matcher
+
+    def set_available_seats(self, node: DriverNode, seats: int):
+        """
+        Changes a driver's number of available seats and repairs the matching 
+        locally. Extra seats are filled from unmatched riders; if seats are 
+        taken away, the driver's most expensive riders are unmatched and 
+        re-matched elsewhere.
+
+        Args:
+            node (DriverNode): The driver whose seats changed.
+            seats (int): The new number of available seats.
+
+        Raises:
+            KeyError: If the driver is not in the graph.
+        """
+        if node not in self.graph.drivers:
+            raise KeyError(node)
+        node.data['available_seats'] = seats
+        node.seats = max(int(seats), 0)
+        matched = self._matched_riders[node]
+        overflow = len(matched) - node.seats
+        if overflow <= 0:
+            self._fill_seats(node)
+            return
+
+        _, rider_ids, total, _ = self.graph.edges(node)
+        is_matched = np.isin(rider_ids, [rider.id for rider in matched])
+        order = np.argsort(-total[is_matched], kind='stable')[:overflow]
+        dropped = [self.graph.nodes[i] for i in rider_ids[is_matched][order].tolist()]
+        for rider in dropped:
+            matched.discard(rider)
+            del self.matching[rider]
+        for rider in dropped:
+            self._match_rider(rider)
+
+    def _feasible(self, total, excess):
+        """
+        Returns a mask of the edges that may be matched: a known route and, if 
+        set, an excess travel time within `max_excess`.
+        """
+        feasible = np.isfinite(total)
+        if self.max_excess is not None:
+            feasible &= excess <= self.max_excess
+        return feasible
+
+    def _match_rider(self, rider):
+        """
+        Matches an unmatched rider to its cheapest feasible driver that still 
+        has a free seat, scanning only the rider's edges.
+        """
+        _, driver_ids, total, excess = self.graph.edges(rider)
+        feasible = self._feasible(total, excess)
+        driver_ids, total = driver_ids[feasible], total[feasible]
+        for i in driver_ids[np.argsort(total, kind='stable')].tolist():
+            driver = self.graph.nodes[i]
+            if len(self._matched_riders[driver]) < driver.seats:
+                self.matching[rider] = driver
+                self._matched_riders[driver].add(rider)
+                return
+
+    def _fill_seats(self, driver):
+        """
+        Fills a driver's free seats with its cheapest feasible unmatched 
+        riders, scanning only the driver's edges.
+        """
+        free = driver.seats - len(self._matched_riders[driver])
+        if free <= 0:
+            return
+        _, rider_ids, total, excess = self.graph.edges(driver)
+        feasible = self._feasible(total, excess)
+        rider_ids, total = rider_ids[feasible], total[feasible]
+        for i in rider_ids[np.argsort(total, kind='stable')].tolist():
+            rider = self.graph.nodes[i]
+            if rider in self.matching:
+                continue
+            self.matching[rider] = driver
+            self._matched_riders[driver].add(rider)
+            free -= 1
+            if free == 0:
+                return
 
     def add_with_location(self, node):
         """
         Adds a node (DriverNode or RiderNode) to the system along with its associated locations.
 
-        Depending on the type of the node, this method performs the following:
-        - For a DriverNode:
-            - Adds the origin location of the driver.
-            - Adds the destination location of the driver and updates it.
-            - Registers the driver node in the system.
-        - For a RiderNode:
-            - Adds the origin location of the rider.
-            - Adds the destination location of the rider and updates it.
-            - Registers the rider node in the system.
+        Nodes are queued and added in batches by `flush`, which fetches the routes 
+        for all of the batch's new origins and destinations at once and then 
+        registers each DriverNode or RiderNode in the system. A flush happens once 
+        `batch_size` nodes are queued or `flush_interval` seconds have passed since 
+        the last one, checked on every add and by the listing and assignment 
+        methods; with the default batch size of 1 every node is added 
+        immediately.
 
         Args:
             node (DriverNode or RiderNode): The node to be added, containing data about
@@ -126,124 +797,239 @@ class Matcher:
         Raises:
             TypeError: If the provided node is not an instance of DriverNode or RiderNode.
         """
-        if isinstance(node, DriverNode):
-            self.add_location(node.data['origin'])
-            self.add_location(node.data['destination'], update=True)
-            self.add_driver(node)
-        elif isinstance(node, RiderNode):
-            self.add_location(node.data['origin'])
-            self.add_location(node.data['destination'], update=True)
-            self.add_rider(node)
+        if not isinstance(node, (DriverNode, RiderNode)):
+            raise TypeError(f"Expected a DriverNode or RiderNode, got {type(node).__name__}")
+
+        self._pending_nodes.append(node)
+        if len(self._pending_nodes) >= self.batch_size:
+            self.flush()
+        else:
+            self._flush_if_due()
+
+    def _flush_if_due(self):
+        """
+        Flushes the queue once `flush_interval` seconds have passed since the 
+        last flush. Besides `add_with_location`, the listing and assignment 
+        methods call this, so a queued node does not wait for the next one.
+        """
+        if self._pending_nodes and self.flush_interval is not None and \
+                time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Adds every node queued by `add_with_location`. The locations of all 
+        queued nodes that are not known yet are fetched together, in both 
+        directions, with as few computeRouteMatrix requests as the API's 
+        element limits allow; then the nodes are registered in arrival order.
+        """
+        nodes, self._pending_nodes = self._pending_nodes, []
+        self._last_flush = time.monotonic()
+        if not nodes:
+            return
+
+        locations = [loc for node in nodes for loc in (node.origin, node.destination)]
+        self._node_locations.update(loc for loc in locations if loc not in self._location_index)
+        self.add_locations(locations, update=True)
+        for node in nodes:
+            if isinstance(node, DriverNode):
+                self.add_driver(node)
+            else:
+                self.add_rider(node)
+
+    def _fetch_route_matrix(self, origins, destinations, routing_preference=None, bucket=None, departure_time=None,
+                            needed=None):
+        """
+        Fetches distances and durations from every origin to every destination. 
+        Pairs found in `self.cache` are not requested; the rest are requested 
+        from `self.provider` grouped by origins that miss the same destinations, 
+        and written back to the cache.
+
+        Args:
+            origins (list): Place IDs to route from.
+            destinations (list): Place IDs to route to.
+            routing_preference (str, optional): Passed through to the provider, 
+                and part of the cache key.
+            bucket (int, optional): Departure-hour bucket of the cache entries. 
+                Defaults to ANY_DEPARTURE, for routes without a departure time.
+            departure_time (datetime, optional): Passed through to the provider.
+            needed (numpy.ndarray, optional): (len(origins), len(destinations)) 
+                mask of the pairs to fetch; the others are not requested and 
+                may be left UNKNOWN. Defaults to every pair.
+
+        Returns:
+            tuple: (distances, durations) int32 arrays of shape 
+                (len(origins), len(destinations)), UNKNOWN where there is no route 
+                or the provider could not tell; only the former is cached.
+        """
+        distances = np.full((len(origins), len(destinations)), UNKNOWN, dtype=np.int32)
+        durations = np.full((len(origins), len(destinations)), UNKNOWN, dtype=np.int32)
+        if not origins or not destinations:
+            return distances, durations
+
+        missing = np.ones((len(origins), len(destinations)), dtype=bool) if needed is None else needed.copy()
+        if self.cache is not None:
+            bucket = ANY_DEPARTURE if bucket is None else bucket
+            dest_index = {loc: j for j, loc in enumerate(destinations)}
+            origin_index = defaultdict(list)
+            for i, loc in enumerate(origins):
+                origin_index[loc].append(i)
+            cached = self.cache.get_many(origins, destinations, bucket, routing_preference)
+            for (origin, destination), (dist, dur) in cached.items():
+                rows, j = origin_index[origin], dest_index[destination]
+                distances[rows, j], durations[rows, j] = dist, dur
+                missing[rows, j] = False
+
+        groups = defaultdict(list) # missing destination indices -> origin indices
+        for i in np.flatnonzero(missing.any(axis=1)):
+            groups[tuple(np.flatnonzero(missing[i]))].append(i)
+
+        fetched = []
+        for dest_idxs, origin_idxs in groups.items():
+            group_origins = [origins[i] for i in origin_idxs]
+            group_dests = [destinations[j] for j in dest_idxs]
+            group_distances, group_durations = self.provider.route_matrix(group_origins, group_dests, routing_preference,
+                                                                         departure_time)
+            # only definite answers are cached; the provider may know the others next time
+            known = group_durations != NOT_FETCHED
+            fetched.extend((group_origins[a], group_dests[b], group_distances[a, b], group_durations[a, b])
+                           for a, b in zip(*np.nonzero(known)))
+            rows, cols = np.ix_(origin_idxs, dest_idxs)
+            distances[rows, cols] = np.where(known, group_distances, UNKNOWN)
+            durations[rows, cols] = np.where(known, group_durations, UNKNOWN)
+
+        if self.cache is not None and fetched:
+            self.cache.put_many(fetched, bucket, routing_preference)
+        return distances, durations
 
     def calc_initial_distance_matrix(self):
         """
-        Calculates the initial distance matrix for the given locations using the Google Distance Matrix API.
-        This method sends a request to the Google Distance Matrix API to compute the distances and durations
-        between all pairs of locations. The results are stored in a 2D numpy array `self.distance_matrix`, 
-        where each element is a tuple containing the distance in meters and the duration in seconds.
+        Calculates the initial distance matrix for the given locations using the matcher's `provider`,
+        the Google Routes API by default. The provider computes the distances and durations
+        between all pairs of locations. The results are stored in two contiguous int32 numpy arrays, 
+        `self.distances` and `self.durations`, indexed as [origin][destination].
         Raises:
             Exception: If the API request fails (non-200 status code), an exception is raised with the error details.
         Attributes:
-            self.distance_matrix (numpy.ndarray): A 2D array where each element is a tuple (distance, duration).
-                - distance (int): The distance in meters between the origin and destination.
-                - duration (int): The duration in seconds between the origin and destination.
+            self.distances (numpy.ndarray): Distance in meters between each origin and destination.
+            self.durations (numpy.ndarray): Duration in seconds between each origin and destination.
+                Pairs without a route are left as UNKNOWN.
         Notes:
-            - The API key for the Google Distance Matrix API must be set in the `GOOGLE_API_KEY` variable.
+            - With the default provider, the API key must be set in the `GOOGLE_API_KEY` variable.
             - The `self.locations` attribute must be a list of location identifiers (e.g., place IDs).
-            - The API request uses the "TRAFFIC_AWARE" routing preference and "DRIVE" travel mode.
+            - The API request uses the "DRIVE" travel mode and is split into chunks 
+              that respect the API's per-request element limits.
         """
-        locs = [{"waypoint": {"placeId": loc}} for loc in self.locations]
-
-        url = "https://routes.googleapis.com/distanceMatrix/v2:computeRouteMatrix"
-        headers = {
-            "Content-Type": "application/json",
-            "X-Goog-Api-Key": GOOGLE_API_KEY,
-            "X-Goog-FieldMask": "originIndex,destinationIndex,distanceMeters,duration"
-        }
-        body = {
-            "origins": locs,
-            "destinations": locs,
-            "travelMode": "DRIVE",
-        }
-        
-        response = requests.post(url, headers=headers, json=body)
-        if response.status_code != 200:
-            raise Exception(f"Error: {response.status_code}, {response.text}")
-        
-        res = response.json()
-
-        # Parse the result to build a 2D array of distances
-        self.distance_matrix = np.zeros((len(self.locations), len(self.locations)), dtype=tuple)
-        for route_matrix_element in res:
-            dest_idx = route_matrix_element['destinationIndex']
-            orig_idx = route_matrix_element['originIndex']
-            dur = int(route_matrix_element['duration'].split("s")[0])
-            dist = 0
-            if dur != 0:
-                dist = route_matrix_element['distanceMeters']
-            self.distance_matrix[dest_idx][orig_idx] = (dist, dur)
+        distances, durations = self._fetch_route_matrix(self.locations, self.locations)
+        np.fill_diagonal(distances, 0)
+        np.fill_diagonal(durations, 0)
+        self.matrix.set(distances, durations)
 
     def update_distance_matrix(self, location):
         """
         Updates the distance matrix with the distances and durations between a new location 
         and the existing locations.
 
-        This method sends a request to the Google Distance Matrix API to compute the distances 
-        and durations between the new location and all existing locations. The results are then 
-        used to update the internal distance matrix.
+        This method asks the matcher's `provider` for the distances and durations between 
+        the new location and all existing locations. The results are then 
+        appended to `self.matrix` as one new row and column, in amortized O(n) time.
 
         Args:
             location (str): The place ID of the new location to be added to the distance matrix.
+                It must not already be in `self.locations`.
 
         Raises:
             Exception: If the API request fails with a non-200 status code.
 
         Notes:
-            - The distance matrix is represented as a NumPy array where each element is a tuple 
-              containing the distance in meters and the duration in seconds.
-            - The diagonal elements of the distance matrix represent the distance and duration 
-              from a location to itself, which are set to (0, 0).
-        """
-        loc = {"waypoint": {"placeId": location}}
-        existing_locs = [{"waypoint": {"placeId": loc}} for loc in self.locations if loc != location]
-
-        url = "https://routes.googleapis.com/distanceMatrix/v2:computeRouteMatrix"
-        headers = {
-            "Content-Type": "application/json",
-            "X-Goog-Api-Key": GOOGLE_API_KEY,
-            "X-Goog-FieldMask": "originIndex,destinationIndex,distanceMeters,duration"
-        }
-        body = {
-            "origins": [loc],
-            "destinations": existing_locs,
-            "travelMode": "DRIVE",
-            "routingPreference": "TRAFFIC_AWARE"
-        }
+            - Both the new location -> existing locations and existing locations -> new 
+              location directions are requested, in chunks that respect the API's limits.
+            - The diagonal element for the new location is set to (0, 0).
+        """
+        self._extend_distance_matrix([location])
 
-        response = requests.post(url, headers=headers, json=body)
-        if response.status_code != 200:
-            raise Exception(f"Error: {response.status_code}, {response.text}")
-
-        res = response.json()
-
-        # Update the distance matrix with new distances
-        new_row = np.zeros((len(self.locations),), dtype=tuple)
-        for route_matrix_element in res:
-            dest_idx = route_matrix_element['destinationIndex']
-            dur = int(route_matrix_element['duration'].split("s")[0])
-            dist = 0
-            if dur != 0:
-                dist = route_matrix_element['distanceMeters']
-                new_row[dest_idx] = (dist, dur)
-
-        # Add the new row and column to the distance matrix
-        if self.distance_matrix is None:
-            self.distance_matrix = np.zeros((1, 1), dtype=tuple)
-            self.distance_matrix[0][0] = new_row[0]
+    def _extend_distance_matrix(self, new_locations):
+        """
+        Fetches the routes from each new location to every location and from 
+        every existing location to each new one, and appends them to the 
+        matrix. Locations added earlier without an update are padded in as 
+        UNKNOWN first.
+        """
+        n = len(self.locations)
+        k = len(new_locations)
+        self.matrix.resize(n)
+
+        if n + k > 1:
+            row_distances, row_durations = self._fetch_route_matrix(
+                new_locations, self.locations + new_locations, routing_preference="TRAFFIC_AWARE")
+            col_distances, col_durations = self._fetch_route_matrix(
+                self.locations, new_locations, routing_preference="TRAFFIC_AWARE")
         else:
-            self.distance_matrix = np.vstack((self.distance_matrix, new_row[:-1]))
-            new_col = np.append(new_row[:-1], (0, 0))  # Add (0, 0) for the diagonal element
-            self.distance_matrix = np.column_stack((self.distance_matrix, new_col))
+            row_distances = np.full((k, n + k), UNKNOWN, dtype=np.int32)
+            row_durations = np.full((k, n + k), UNKNOWN, dtype=np.int32)
+            col_distances = col_durations = None
+        row_distances[:, n:][np.diag_indices(k)] = 0
+        row_durations[:, n:][np.diag_indices(k)] = 0
+
+        self.matrix.append(row_distances, row_durations, col_distances, col_durations)
+
+    @staticmethod
+    def departure_bucket(departure):
+        """Returns the local departure hour (0-23) of a POSIX timestamp."""
+        return datetime.fromtimestamp(departure).hour
+
+    def _durations_at(self, departure, origins, destinations):
+        """
+        Returns the durations to cost a trip departing at the `departure` 
+        timestamp with: its hour's slice when `time_slices` is set, after 
+        fetching the entries from `origins[k]` to `destinations[k]` it lacks, 
+        otherwise the single `durations` matrix.
+        """
+        if self.time_slices is None or departure is None:
+            return self.durations
+        return self._time_slice(self.departure_bucket(departure), origins, destinations).durations
+
+    def _time_slice(self, bucket, origins, destinations):
+        """
+        Returns the travel matrix of a departure-hour bucket and marks it most 
+        recently used. The entries from each of `origins` to the matching one 
+        of `destinations` that it has not fetched yet are fetched first, with 
+        traffic predicted for the next time that hour comes around. Only the 
+        entries a caller reads are fetched, so refilling an evicted slice 
+        costs as much as the costing that needs it rather than a full matrix.
+
+        Args:
+            bucket (int): Departure hour.
+            origins (numpy.ndarray): Location indices.
+            destinations (numpy.ndarray): Location indices, one per origin.
+        """
+        matrix = self.time_slices.get(bucket)
+        if matrix is None:
+            matrix = TravelMatrix(fill=NOT_FETCHED)
+        n = len(self._locations)
+        matrix.resize(n)
+        self.time_slices.put(bucket, matrix)
+
+        origins = np.asarray(origins, dtype=np.intp)
+        destinations = np.asarray(destinations, dtype=np.intp)
+        missing = matrix.durations[origins, destinations] == NOT_FETCHED
+        if not missing.any():
+            return matrix
+        cells = np.unique(origins[missing] * n + destinations[missing])
+        row_ids, rows = np.unique(cells // n, return_inverse=True)
+        col_ids, cols = np.unique(cells % n, return_inverse=True)
+        needed = np.zeros((len(row_ids), len(col_ids)), dtype=bool)
+        needed[rows, cols] = True
+
+        now = datetime.now()
+        departure_time = now.replace(hour=bucket, minute=30, second=0, microsecond=0)
+        if departure_time <= now:
+            departure_time += timedelta(days=1)
+        distances, durations = self._fetch_route_matrix(
+            [self._locations[i] for i in row_ids.tolist()], [self._locations[j] for j in col_ids.tolist()],
+            "TRAFFIC_AWARE", bucket, departure_time, needed)
+        matrix.update(row_ids, col_ids, distances, durations, needed)
+        return matrix
 
     def calc_cost(self, rider: RiderNode, driver: DriverNode):
         """
@@ -260,14 +1046,28 @@ class Matcher:
                   destination, and the excess travel time caused by picking up and dropping off the rider.
                 - excess_travel_time (float): The additional travel time incurred by the driver due to 
                   picking up and dropping off the rider.
+            Both are infinite if any leg's duration is UNKNOWN.
+
+        Note:
+            With `time_slices` set, durations come from the slice of the driver's 
+            departure hour.
         """
-        rider_src, rider_dest = rider.data['origin'], rider.data['destination']
-        driver_src, driver_dest = driver.data['origin'], driver.data['destination']
+        rider_src, rider_dest = rider.origin, rider.destination
+        driver_src, driver_dest = driver.origin, driver.destination
+
+        index = self._location_index
+        rider_src, rider_dest = index[rider_src], index[rider_dest]
+        driver_src, driver_dest = index[driver_src], index[driver_dest]
 
-        driver_src_to_rider_src = self.distance_matrix[self.locations.index(driver_src)][self.locations.index(rider_src)][1]
-        driver_src_to_driver_dest = self.distance_matrix[self.locations.index(driver_src)][self.locations.index(driver_dest)][1]
-        rider_src_to_rider_dest = self.distance_matrix[self.locations.index(rider_src)][self.locations.index(rider_dest)][1]
-        rider_dest_to_driver_dest = self.distance_matrix[self.locations.index(rider_dest)][self.locations.index(driver_dest)][1]
+        durations = self._durations_at(driver.departure, [driver_src, driver_src, rider_src, rider_dest],
+                                       [rider_src, driver_dest, rider_dest, driver_dest])
+        driver_src_to_rider_src = int(durations[driver_src, rider_src])
+        driver_src_to_driver_dest = int(durations[driver_src, driver_dest])
+        rider_src_to_rider_dest = int(durations[rider_src, rider_dest])
+        rider_dest_to_driver_dest = int(durations[rider_dest, driver_dest])
+
+        if UNKNOWN in (driver_src_to_rider_src, driver_src_to_driver_dest, rider_src_to_rider_dest, rider_dest_to_driver_dest):
+            return (float('inf'), float('inf'))
 
         detour_from_src = driver_src_to_rider_src/60
         detour_from_dest = rider_dest_to_driver_dest/60
@@ -278,6 +1078,483 @@ class Matcher:
 
         return (total, excess_travel_time)
 
+    def _node_indices(self, nodes):
+        """
+        Gathers the origin and destination matrix indices of `nodes` into two 
+        integer arrays.
+        """
+        index = self._location_index
+        src = np.fromiter((index[node.origin] for node in nodes), dtype=np.intp, count=len(nodes))
+        dest = np.fromiter((index[node.destination] for node in nodes), dtype=np.intp, count=len(nodes))
+        return src, dest
+
+    @staticmethod
+    def _cost_block(durations, rider_src, rider_dest, driver_src, driver_dest):
+        """
+        Returns the (total, excess) cost matrices of riders x drivers given 
+        by their matrix indices, infinite where a leg is UNKNOWN.
+        """
+        driver_src_to_rider_src = durations[driver_src[None, :], rider_src[:, None]]
+        driver_src_to_driver_dest = durations[driver_src, driver_dest][None, :]
+        rider_src_to_rider_dest = durations[rider_src, rider_dest][:, None]
+        rider_dest_to_driver_dest = durations[rider_dest[:, None], driver_dest[None, :]]
+
+        unknown = ((driver_src_to_rider_src == UNKNOWN) | (driver_src_to_driver_dest == UNKNOWN)
+                   | (rider_src_to_rider_dest == UNKNOWN) | (rider_dest_to_driver_dest == UNKNOWN))
+
+        excess_travel_time = (driver_src_to_rider_src + rider_src_to_rider_dest + rider_dest_to_driver_dest
+                              - driver_src_to_driver_dest) / 60
+        total = (driver_src_to_rider_src + rider_dest_to_driver_dest) / 60 + excess_travel_time
+        total[unknown] = np.inf
+        excess_travel_time[unknown] = np.inf
+        return total, excess_travel_time
+
+    def compute_cost_matrix(self, riders=None, drivers=None):
+        """
+        Computes the cost of every rider/driver pair at once with NumPy fancy 
+        indexing. Each entry matches what `calc_cost` returns for that pair.
+
+        Args:
+            riders (list, optional): RiderNodes to cost. Defaults to every 
+                rider in the graph.
+            drivers (list, optional): DriverNodes to cost. Defaults to every 
+                driver in the graph.
+
+        Returns:
+            tuple: A tuple containing:
+                - riders (list): The riders, in row order.
+                - drivers (list): The drivers, in column order.
+                - total (numpy.ndarray): (len(riders), len(drivers)) float64 
+                  matrix of total costs in minutes.
+                - excess_travel_time (numpy.ndarray): Matrix of the same shape 
+                  holding the driver's excess travel time in minutes.
+            Pairs with an UNKNOWN leg are infinite in both matrices.
+        """
+        riders = list(self.graph.riders) if riders is None else list(riders)
+        drivers = list(self.graph.drivers) if drivers is None else list(drivers)
+        if not riders or not drivers:
+            empty = np.zeros((len(riders), len(drivers)))
+            return riders, drivers, empty, empty.copy()
+
+        rider_src, rider_dest = self._node_indices(riders)
+        driver_src, driver_dest = self._node_indices(drivers)
+        # riders making the same trip share one row, so the work scales with distinct trips
+        trips = None
+        if len(riders) > 1 and len(drivers) > 1:
+            trips, first, inverse = np.unique(rider_src * len(self._locations) + rider_dest,
+                                              return_index=True, return_inverse=True)
+            if len(trips) < len(riders):
+                rider_src, rider_dest = rider_src[first], rider_dest[first]
+            else:
+                trips = None
+
+        if self.time_slices is None:
+            total, excess_travel_time = self._cost_block(self.durations, rider_src, rider_dest, driver_src, driver_dest)
+        else:
+            # cost the drivers of each departure hour with that hour's slice
+            total = np.empty((len(rider_src), len(drivers)))
+            excess_travel_time = np.empty((len(rider_src), len(drivers)))
+            buckets = np.array([-1 if driver.departure is None else self.departure_bucket(driver.departure)
+                                for driver in drivers])
+            for bucket in np.unique(buckets).tolist():
+                cols = np.flatnonzero(buckets == bucket)
+                if bucket < 0:
+                    durations = self.durations
+                else:
+                    # the entries _cost_block reads: driver to rider origins, rider trips, 
+                    # rider destinations to drivers' and driver trips
+                    src, dest = driver_src[cols], driver_dest[cols]
+                    durations = self._time_slice(bucket, np.concatenate((
+                        np.repeat(src, len(rider_src)), rider_src, np.repeat(rider_dest, len(dest)), src)),
+                        np.concatenate((np.tile(rider_src, len(src)), rider_dest, np.tile(dest, len(rider_dest)), dest))
+                    ).durations
+                total[:, cols], excess_travel_time[:, cols] = self._cost_block(
+                    durations, rider_src, rider_dest, driver_src[cols], driver_dest[cols])
+        if trips is not None:
+            total, excess_travel_time = total[inverse], excess_travel_time[inverse]
+
+        return riders, drivers, total, excess_travel_time
+
+    def _seat_slots(self, drivers):
+        """
+        Expands drivers into one slot per available seat. Drivers without an 
+        `available_seats` entry get a single slot.
+
+        Returns:
+            numpy.ndarray: For each slot, the column of its driver in `drivers`.
+        """
+        seats = [driver.seats for driver in drivers]
+        return np.repeat(np.arange(len(drivers)), seats)
+
+    def assign(self, max_excess=None, warm_start=False):
+        """
+        Solves the global min-cost assignment of riders to drivers, so no two 
+        riders are offered the same seat. Unlike `sort_listings`, which ranks 
+        drivers for each rider independently, every driver is treated as one 
+        slot per available seat and the rectangular problem is solved with 
+        `scipy.optimize.linear_sum_assignment`.
+
+        Args:
+            max_excess (float, optional): Largest excess travel time in minutes 
+                a driver will accept for a rider. Defaults to the matcher's 
+                `max_excess`.
+            warm_start (bool, optional): If True, solves with the matcher's 
+                `LAPSolver`, reusing the duals and assignment of the previous 
+                warm-started call so re-solves after small changes are cheap. 
+                Defaults to False.
+
+        Returns:
+            tuple: A tuple containing:
+                - pairs (list): (RiderNode, DriverNode) tuples for every 
+                  matched rider. Riders with no feasible driver are left out.
+                - total_cost (float): The sum of the total costs of the pairs.
+        """
+        self._flush_if_due()
+        riders, drivers, total, excess = self.compute_cost_matrix()
+        slots = self._seat_slots(drivers)
+        if not riders or len(slots) == 0:
+            return [], 0.0
+
+        cost = total[:, slots]
+        infeasible = ~np.isfinite(cost)
+        if max_excess is None:
+            max_excess = self.max_excess
+        if max_excess is not None:
+            infeasible |= excess[:, slots] > max_excess
+        if self.departure_window is not None:
+            rider_times = np.array([rider.departure for rider in riders], dtype=float)
+            driver_times = np.array([driver.departure for driver in drivers], dtype=float)[slots]
+            # pairs where either side has no departure time compare as NaN and stay feasible
+            infeasible |= np.abs(rider_times[:, None] - driver_times[None, :]) > self.departure_window
+        cost = np.where(infeasible, INFEASIBLE_COST, cost)
+
+        if warm_start:
+            seat_numbers = np.arange(len(slots)) - np.searchsorted(slots, slots)
+            slot_keys = [(drivers[j], k) for j, k in zip(slots.tolist(), seat_numbers.tolist())]
+            rows, cols = self._lap_solver.solve(cost, row_keys=riders, col_keys=slot_keys)
+        else:
+            rows, cols = linear_sum_assignment(cost)
+        feasible = ~infeasible[rows, cols]
+        rows, cols = rows[feasible], cols[feasible]
+
+        pairs = [(riders[i], drivers[slots[j]]) for i, j in zip(rows, cols)]
+        return pairs, float(cost[rows, cols].sum())
+
+    def assign_seats(self, max_excess=None):
+        """
+        Solves the global min-cost seat-capacitated b-matching over the sparse 
+        candidate graph: each rider gets at most one driver and each driver at 
+        most `seats` riders, as many riders as possible are matched, and the 
+        total cost of the pairs is minimal among such matchings.
+
+        Only existing edges are candidates, so pairs outside the departure 
+        window cost nothing. Each driver is split into one column per seat 
+        and every rider gets a private fallback column, then the sparse 
+        assignment is solved with SciPy's LAPJVsp 
+        (`min_weight_full_bipartite_matching`), a shortest augmenting path 
+        min-cost flow on the expanded graph.
+
+        Args:
+            max_excess (float, optional): Largest excess travel time in minutes 
+                a driver will accept. Defaults to the matcher's `max_excess`. A 
+                rider's own `max_excess` entry, if lower, applies to that rider.
+
+        Returns:
+            tuple: A tuple containing:
+                - pairs (list): (RiderNode, DriverNode) tuples for every 
+                  matched rider.
+                - total_cost (float): The sum of the total costs of the pairs.
+        """
+        self._flush_if_due()
+        riders, drivers, rows, cols, total = self._seat_problem(max_excess)
+        if not riders or not drivers:
+            return [], 0.0
+        seats = np.array([driver.seats for driver in drivers], dtype=np.intp)
+        matched_rows, matched_cols, costs = self._solve_seats(len(riders), seats, rows, cols, total)
+        pairs = [(riders[i], drivers[j]) for i, j in zip(matched_rows.tolist(), matched_cols.tolist())]
+        return pairs, float(costs.sum())
+
+    def _seat_problem(self, max_excess=None):
+        """
+        Collects the live edges that may be matched as a sparse problem.
+
+        Returns:
+            tuple: (riders, drivers, rows, cols, total), where each candidate 
+                pair is rider `riders[rows[k]]` and driver `drivers[cols[k]]` 
+                with total cost `total[k]`.
+        """
+        graph = self.graph
+        riders, drivers = list(graph.riders), list(graph.drivers)
+        row_of = np.full(len(graph.nodes), -1, dtype=np.intp)
+        col_of = np.full(len(graph.nodes), -1, dtype=np.intp)
+        row_of[[rider.id for rider in riders]] = np.arange(len(riders))
+        col_of[[driver.id for driver in drivers]] = np.arange(len(drivers))
+
+        live = np.flatnonzero(graph.edge_alive[:graph.n_edges])
+        rows, cols = row_of[graph.edge_rider[live]], col_of[graph.edge_driver[live]]
+        total, excess = graph.edge_total[live], graph.edge_excess[live]
+
+        if max_excess is None:
+            max_excess = self.max_excess
+        limits = np.array([np.inf if rider.max_excess is None else rider.max_excess for rider in riders], dtype=float)
+        if max_excess is not None:
+            limits = np.minimum(limits, max_excess)
+        keep = np.isfinite(total) & (excess <= limits[rows])
+        return riders, drivers, rows[keep], cols[keep], total[keep]
+
+    @staticmethod
+    def _solve_seats(n_riders, seats, rows, cols, total, fallback=INFEASIBLE_COST):
+        """
+        Solves the sparse seat-capacitated b-matching exactly, leaving a rider 
+        unmatched at a cost of `fallback`.
+
+        Returns:
+            tuple: (matched rows, their driver columns, their costs) arrays.
+        """
+        if n_riders == 0 or len(seats) == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0)
+        # one column per seat
+        first_slot = np.cumsum(seats) - seats
+        repeats = seats[cols]
+        edge = np.repeat(np.arange(len(rows)), repeats)
+        seat = np.arange(len(edge)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+        n_slots = int(seats.sum())
+
+        # a fallback column per rider keeps a full matching feasible; every 
+        # rider is matched once, so shifting all costs to at least one keeps the 
+        # optimum and stops SciPy dropping entries that would be zero
+        shift = 1 - min(total.min(initial=0), fallback, 0)
+        matrix = csr_matrix((np.concatenate((total[edge] + shift, np.full(n_riders, fallback + shift))),
+                             (np.concatenate((rows[edge], np.arange(n_riders))),
+                              np.concatenate((first_slot[cols[edge]] + seat, n_slots + np.arange(n_riders))))),
+                            shape=(n_riders, n_slots + n_riders))
+        matched_rows, matched_cols = min_weight_full_bipartite_matching(matrix)
+
+        real = matched_cols < n_slots
+        matched_rows, matched_cols = matched_rows[real], matched_cols[real]
+        if not len(matched_rows):
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0)
+        driver_cols = np.searchsorted(first_slot, matched_cols, side='right') - 1
+        costs = np.asarray(matrix[matched_rows, matched_cols]).ravel() - shift
+        return matched_rows, driver_cols, costs
+
+    def _solve_seats_approx(self, n_riders, seats, rows, cols, total, method, epsilon, unmatched_cost):
+        """
+        Solves the sparse seat-capacitated b-matching with `method`, 'greedy' 
+        or 'auction', leaving a rider unmatched at a cost of `unmatched_cost`.
+
+        Returns:
+            tuple: (matched rows, their driver columns, their costs) arrays.
+        """
+        # a pair costing more than leaving its rider unmatched is never worth it
+        keep = total < unmatched_cost
+        rows, cols, total = rows[keep], cols[keep], total[keep]
+        if method == 'greedy':
+            chosen = greedy_b_matching(n_riders, seats, rows, cols, total)
+            return rows[chosen], cols[chosen], total[chosen]
+        if method == 'auction':
+            return auction_b_matching(n_riders, seats, rows, cols, total, epsilon, unmatched_cost)
+        raise ValueError(f"Unknown matching method {method!r}")
+
+    def assign_approx(self, method='auction', epsilon=1.0, unmatched_cost=UNMATCHED_COST, max_excess=None):
+        """
+        Approximately solves the problem of `assign_seats` on the same sparse 
+        candidate edges, for batches too large for the exact solver. Instead of 
+        matching as many riders as possible first, an unmatched rider counts 
+        as `unmatched_cost` minutes, so pairs costing more are never made.
+
+        'greedy' takes edges from cheapest to most expensive while the rider 
+        is free and the driver has a seat, in O(E log E) with no quality bound. 
+        'auction' runs a Bertsekas auction in which riders bid for seats; its 
+        total cost, unmatched riders included, is within `epsilon` minutes per 
+        rider of the optimum. The auction scales its bid increment down from
+        `unmatched_cost` to `epsilon` in phases, so run time grows with
+        log(unmatched_cost / epsilon) rather than with their ratio. Use
+        `approximation_gap` to measure the actual loss on a workload.
+
+        Args:
+            method (str, optional): 'auction' or 'greedy'.
+            epsilon (float, optional): Auction bid increment in minutes.
+            unmatched_cost (float, optional): Cost in minutes of leaving a rider 
+                unmatched.
+            max_excess (float, optional): As in `assign_seats`.
+
+        Returns:
+            tuple: (pairs, total_cost) as returned by `assign_seats`.
+
+        Raises:
+            ValueError: If `method` is unknown or `epsilon` is not positive.
+        """
+        self._flush_if_due()
+        riders, drivers, rows, cols, total = self._seat_problem(max_excess)
+        seats = np.array([driver.seats for driver in drivers], dtype=np.intp)
+        matched_rows, matched_cols, costs = self._solve_seats_approx(len(riders), seats, rows, cols, total,
+                                                                     method, epsilon, unmatched_cost)
+        pairs = [(riders[i], drivers[j]) for i, j in zip(matched_rows.tolist(), matched_cols.tolist())]
+        return pairs, float(costs.sum())
+
+    def approximation_gap(self, method='auction', epsilon=1.0, unmatched_cost=UNMATCHED_COST, max_excess=None,
+                          n_samples=5, sample_drivers=100, seed=0):
+        """
+        Measures how much `assign_approx` loses against the optimum on sampled 
+        subproblems: each sample takes `sample_drivers` random drivers and the 
+        same share of the riders, keeping supply and demand in proportion, and 
+        solves the subgraph between them both approximately and exactly, with 
+        the same `unmatched_cost`.
+
+        Args:
+            method (str, optional): Passed to `assign_approx`.
+            epsilon (float, optional): Passed to `assign_approx`.
+            unmatched_cost (float, optional): Passed to `assign_approx`.
+            max_excess (float, optional): As in `assign_seats`.
+            n_samples (int, optional): Number of subproblems.
+            sample_drivers (int, optional): Drivers per subproblem.
+            seed (int, optional): Random seed.
+
+        Returns:
+            dict: Totals over the samples: 'riders', 'exact_matched' and 
+                'approx_matched' (riders matched), 'exact_cost' and 
+                'approx_cost' (objective in minutes, unmatched riders 
+                included), and 'gap', the relative excess of the approximate 
+                objective.
+        """
+        riders, drivers, rows, cols, total = self._seat_problem(max_excess)
+        seats = np.array([driver.seats for driver in drivers], dtype=np.intp)
+        rng = np.random.default_rng(seed)
+        result = {'riders': 0, 'exact_matched': 0, 'approx_matched': 0, 'exact_cost': 0.0, 'approx_cost': 0.0}
+        for _ in range(n_samples if drivers and riders else 0):
+            n_drivers = min(sample_drivers, len(drivers))
+            n_riders = round(len(riders) * n_drivers / len(drivers))
+            sampled = rng.choice(len(drivers), size=n_drivers, replace=False)
+            col_map = np.full(len(drivers), -1, dtype=np.intp)
+            col_map[sampled] = np.arange(n_drivers)
+            row_map = np.full(len(riders), -1, dtype=np.intp)
+            row_map[rng.choice(len(riders), size=n_riders, replace=False)] = np.arange(n_riders)
+            in_sample = (col_map[cols] >= 0) & (row_map[rows] >= 0)
+            problem = (n_riders, seats[sampled], row_map[rows[in_sample]], col_map[cols[in_sample]], total[in_sample])
+
+            _, _, exact_costs = self._solve_seats(*problem, fallback=unmatched_cost)
+            _, _, approx_costs = self._solve_seats_approx(*problem, method, epsilon, unmatched_cost)
+            result['riders'] += n_riders
+            for name, costs in (('exact', exact_costs), ('approx', approx_costs)):
+                result[f'{name}_matched'] += len(costs)
+                result[f'{name}_cost'] += float(costs.sum()) + (n_riders - len(costs)) * unmatched_cost
+        exact = result['exact_cost']
+        result['gap'] = (result['approx_cost'] - exact) / exact if exact else 0.0
+        return result
+
+    def route(self, driver: DriverNode):
+        """
+        Returns:
+            list: The driver's confirmed stops in driving order, as 
+                (RiderNode, is_pickup) tuples.
+        """
+        return list(self._routes.get(driver, []))
+
+    def insertion_cost(self, driver: DriverNode, rider: RiderNode):
+        """
+        Finds where to insert a rider's pickup and dropoff into a driver's 
+        confirmed stop sequence with the least added driving time, using only 
+        the travel matrix. Every pair of legs (i, j), i <= j, is tried: the 
+        pickup goes into leg i and the dropoff into leg j, and no leg in 
+        between may already carry `driver.seats` riders. A running minimum 
+        over the pickup legs makes this O(number of stops).
+
+        Args:
+            driver (DriverNode): The driver, whose route runs from its origin 
+                through its confirmed stops to its destination.
+            rider (RiderNode): The rider to insert.
+
+        Returns:
+            tuple: (detour, pickup_index, dropoff_index), where detour is the 
+                added travel time in minutes and the indices are the positions 
+                of the pickup and dropoff in the new stop list. The detour is 
+                infinite and the indices -1 if no insertion is feasible or each 
+                one drives a leg whose duration is UNKNOWN.
+        """
+        index = self._location_index
+        stops = self._routes.get(driver, [])
+        points = np.fromiter((index[driver.origin], *(index[r.origin if pickup else r.destination] for r, pickup in stops),
+                              index[driver.destination]), dtype=np.intp, count=len(stops) + 2)
+        load = np.cumsum([0] + [1 if pickup else -1 for _, pickup in stops]) # riders on board on each leg
+        p, q = index[rider.origin], index[rider.destination]
+
+        tails, heads = points[:-1], points[1:]
+        k = len(tails)
+        durations = self._durations_at(driver.departure,
+                                       np.concatenate((tails, tails, np.full(k, p), tails, np.full(k, q), [p])),
+                                       np.concatenate((heads, np.full(k, p), heads, np.full(k, q), heads, [q])))
+        legs = [durations[tails, heads], durations[tails, p], durations[p, heads],
+                durations[tails, q], durations[q, heads], np.full(len(tails), durations[p, q])]
+        # each option is ruled out only by an UNKNOWN leg that it drives
+        no_leg, no_to_p, no_from_p, no_to_q, no_from_q, no_p_to_q = (leg == UNKNOWN for leg in legs)
+        leg, to_p, from_p, to_q, from_q, p_to_q = (leg.astype(np.float64) for leg in legs)
+        pickup_cost = np.where(no_leg | no_to_p | no_from_p, np.inf, to_p + from_p - leg)
+        dropoff_cost = np.where(no_leg | no_to_q | no_from_q, np.inf, to_q + from_q - leg)
+        same_leg_cost = np.where(no_leg | no_to_p | no_p_to_q | no_from_q, np.inf, to_p + p_to_q + from_q - leg)
+        has_room = load < driver.seats
+
+        best, best_i, best_j = np.inf, -1, -1
+        pickup_min, pickup_leg = np.inf, -1 # cheapest pickup leg since the last full leg
+        for j in range(len(tails)):
+            if not has_room[j]:
+                pickup_min, pickup_leg = np.inf, -1
+                continue
+            if same_leg_cost[j] < best:
+                best, best_i, best_j = same_leg_cost[j], j, j
+            if pickup_min + dropoff_cost[j] < best:
+                best, best_i, best_j = pickup_min + dropoff_cost[j], pickup_leg, j
+            if pickup_cost[j] < pickup_min:
+                pickup_min, pickup_leg = pickup_cost[j], j
+        if best_i < 0:
+            return float('inf'), -1, -1
+        return float(best) / 60, best_i, best_j + 1
+
+    def insert_rider(self, driver: DriverNode, rider: RiderNode):
+        """
+        Confirms a rider on a driver's route at the cheapest insertion found 
+        by `insertion_cost`. This only changes the route; `matching` is 
+        maintained separately.
+
+        Returns:
+            float: The added travel time in minutes.
+
+        Raises:
+            ValueError: If the rider is already on a route or cannot be inserted.
+        """
+        if rider in self._route_of:
+            raise ValueError("rider is already on a route")
+        detour, pickup_index, dropoff_index = self.insertion_cost(driver, rider)
+        if pickup_index < 0:
+            raise ValueError("no feasible insertion")
+        stops = self._routes.setdefault(driver, [])
+        stops.insert(pickup_index, (rider, True))
+        stops.insert(dropoff_index, (rider, False))
+        self._route_of[rider] = driver
+        return detour
+
+    def sort_pooled_listings(self, rider: RiderNode, n: int):
+        """
+        Ranks the drivers connected to a rider by the marginal detour of 
+        inserting the rider into each one's confirmed route, so drivers who 
+        already carry riders are ranked without a route optimization call. 
+        Drivers whose detour exceeds `max_excess` are left out.
+
+        Returns:
+            list: Up to `n` (DriverNode, (detour, pickup_index, dropoff_index)) 
+                tuples sorted by detour.
+        """
+        self._flush_if_due()
+        if rider not in self.graph.riders:
+            return []
+        _, driver_ids, _, _ = self.graph.edges(rider)
+        listings = []
+        for driver in (self.graph.nodes[i] for i in driver_ids.tolist()):
+            cost = self.insertion_cost(driver, rider)
+            if cost[1] >= 0 and (self.max_excess is None or cost[0] <= self.max_excess):
+                listings.append((driver, cost))
+        return nsmallest(n, listings, key=lambda x: x[1][0])
+
     def sort_listings(self, node: Node, n: int):
         """
         Sorts and retrieves the top `n` listings connected to the given node 
@@ -291,12 +1568,23 @@ class Matcher:
             list: A list of the top `n` listings connected to the given node, 
                   sorted by their weights in ascending order. Each listing is 
                   represented as a tuple (listing, weight).
+
+        Note:
+            For `n` up to `top_k` this reads the node's incrementally maintained 
+            `TopK` in O(n); larger `n` falls back to a scan of all its edges.
         """
-        top = nsmallest(n, self._revgraph[node], key=lambda x: x[1][0])
-        return top
+        self._flush_if_due()
+        if node not in self.graph:
+            return []
+        top = self._top[node]
+        if n > top.k:
+            return nsmallest(n, self.graph.edge_list(node), key=lambda x: x[1][0])
+        if top.stale:
+            top.rebuild(self.graph.edge_list(node))
+        return top.items(n)
     
 if __name__ == "__main__":
-    match = Matcher()
+    match = Matcher(cache=TravelTimeCache())
 
     # match.locations = ["place_id:ChIJfdcUqp1AwFQRvsC9Io-ADdc",
     #                    "place_id:ChIJv0fYEV4XwFQRAKdgafDZ1R8",
@@ -0,0 +1,303 @@
+import numpy as np
+from datetime import timezone
+from dotenv import load_dotenv
+import os
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from travel_matrix import UNKNOWN, NOT_FETCHED
+
+load_dotenv()
+GOOGLE_API_KEY = os.getenv("REACT_APP_GOOGLE_MAPS_API_KEY")
+ROUTES_BASE_URL = os.getenv("GOOGLE_ROUTES_BASE_URL", "https://routes.googleapis.com") # e.g. a local mock_google.py
+ROUTE_MATRIX_PATH = "/distanceMatrix/v2:computeRouteMatrix"
+ROUTE_MATRIX_MAX_ELEMENTS = 625 # origins x destinations allowed per computeRouteMatrix request
+ROUTE_MATRIX_MAX_PLACE_WAYPOINTS = 50 # origins + destinations allowed per request when given as place IDs
+
+class TravelTimeProvider:
+    """
+    Source of the travel distances and durations a `Matcher` fills its
+    matrix from. Subclasses implement `route_matrix`.
+    """
+    def route_matrix(self, origins, destinations, routing_preference=None, departure_time=None):
+        """
+        Computes distances and durations from every origin to every destination.
+
+        Args:
+            origins (list): Place IDs to route from.
+            destinations (list): Place IDs to route to.
+            routing_preference (str, optional): A hint such as "TRAFFIC_AWARE",
+                which providers may ignore.
+            departure_time (datetime, optional): When the trips start, for
+                providers with time-dependent travel times. Naive datetimes
+                are local time.
+
+        Returns:
+            tuple: (distances, durations) int32 arrays of shape
+                (len(origins), len(destinations)) in meters and seconds,
+                UNKNOWN where there is no route and NOT_FETCHED where the
+                provider could not tell, e.g. after a per-element error.
+        """
+        raise NotImplementedError
+
+class GoogleRoutesProvider(TravelTimeProvider):
+    """
+    Travel times from the Google Routes API's computeRouteMatrix, split into
+    as many requests as its per-request limits require. Requests go through
+    one keep-alive session, so a burst of chunks reuses its TLS connections,
+    and up to `max_concurrency` chunks are in flight at once.
+    """
+    def __init__(self, api_key=None, base_url=None, max_concurrency=4):
+        self.api_key = api_key or GOOGLE_API_KEY
+        self.route_matrix_url = (base_url or ROUTES_BASE_URL).rstrip('/') + ROUTE_MATRIX_PATH
+        self.max_concurrency = max_concurrency # chunk requests sent in parallel
+        self._session = None
+        self._executor = None
+
+    def __getstate__(self):
+        # sessions and thread pools are per process
+        return {**self.__dict__, '_session': None, '_executor': None}
+
+    @property
+    def session(self):
+        """The shared keep-alive `requests.Session`, created on first use."""
+        if self._session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(self.max_concurrency, 1))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+        return self._session
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _compute_route_matrix(self, origins, destinations, routing_preference=None, departure_time=None):
+        """
+        Sends a computeRouteMatrix request to the Google Routes API.
+
+        Args:
+            origins (list): Place IDs to route from.
+            destinations (list): Place IDs to route to.
+            routing_preference (str, optional): Routing preference such as
+                "TRAFFIC_AWARE". Defaults to the API default.
+            departure_time (datetime, optional): Departure time for traffic
+                predictions, which must not be in the past. Defaults to now.
+
+        Returns:
+            list: The route matrix elements returned by the API.
+
+        Raises:
+            Exception: If the API request fails (non-200 status code).
+        """
+        headers = {
+            "Content-Type": "application/json",
+            "X-Goog-Api-Key": self.api_key,
+            "X-Goog-FieldMask": "originIndex,destinationIndex,distanceMeters,duration,condition"
+        }
+        body = {
+            "origins": [{"waypoint": {"placeId": loc}} for loc in origins],
+            "destinations": [{"waypoint": {"placeId": loc}} for loc in destinations],
+            "travelMode": "DRIVE",
+        }
+        if routing_preference:
+            body["routingPreference"] = routing_preference
+        if departure_time is not None:
+            body["departureTime"] = departure_time.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        response = self.session.post(self.route_matrix_url, headers=headers, json=body)
+        if response.status_code != 200:
+            raise Exception(f"Error: {response.status_code}, {response.text}")
+
+        return response.json()
+
+    @staticmethod
+    def _parse_element(route_matrix_element):
+        """
+        Extracts (distance, duration) from a route matrix element, returning
+        (UNKNOWN, UNKNOWN) when the API found no route and (NOT_FETCHED,
+        NOT_FETCHED) when the element failed without saying, e.g. with an
+        error status.
+        """
+        if 'duration' not in route_matrix_element:
+            if route_matrix_element.get('condition') == 'ROUTE_NOT_FOUND':
+                return UNKNOWN, UNKNOWN
+            return NOT_FETCHED, NOT_FETCHED
+        dur = int(route_matrix_element['duration'].split("s")[0])
+        dist = route_matrix_element.get('distanceMeters', 0) if dur != 0 else 0
+        return dist, dur
+
+    @staticmethod
+    def _route_matrix_chunks(n_origins, n_destinations):
+        """
+        Splits an origins x destinations route matrix into blocks that each fit
+        in one computeRouteMatrix request.
+
+        Yields:
+            tuple: (origin slice, destination slice) of each block.
+        """
+        origin_chunk = min(n_origins, ROUTE_MATRIX_MAX_PLACE_WAYPOINTS // 2)
+        dest_chunk = min(n_destinations, ROUTE_MATRIX_MAX_ELEMENTS // origin_chunk,
+                         ROUTE_MATRIX_MAX_PLACE_WAYPOINTS - origin_chunk)
+        for i in range(0, n_origins, origin_chunk):
+            for j in range(0, n_destinations, dest_chunk):
+                yield slice(i, i + origin_chunk), slice(j, j + dest_chunk)
+
+    def route_matrix(self, origins, destinations, routing_preference=None, departure_time=None):
+        """
+        Requests every chunk, in parallel when there are several, and merges 
+        the elements into the result arrays on the calling thread once all 
+        chunks are in, so callers only ever publish complete results. 
+        Elements missing from the responses are NOT_FETCHED.
+        """
+        distances = np.full((len(origins), len(destinations)), NOT_FETCHED, dtype=np.int32)
+        durations = np.full((len(origins), len(destinations)), NOT_FETCHED, dtype=np.int32)
+        chunks = list(self._route_matrix_chunks(len(origins), len(destinations)))
+
+        def fetch(chunk):
+            origin_slice, dest_slice = chunk
+            return self._compute_route_matrix(origins[origin_slice], destinations[dest_slice], routing_preference,
+                                              departure_time)
+
+        if len(chunks) > 1 and self.max_concurrency > 1:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+            responses = list(self._executor.map(fetch, chunks))
+        else:
+            responses = [fetch(chunk) for chunk in chunks]
+
+        for (origin_slice, dest_slice), res in zip(chunks, responses):
+            for route_matrix_element in res:
+                orig_idx = origin_slice.start + route_matrix_element['originIndex']
+                dest_idx = dest_slice.start + route_matrix_element['destinationIndex']
+                distances[orig_idx, dest_idx], durations[orig_idx, dest_idx] = self._parse_element(route_matrix_element)
+        return distances, durations
+
+class RoadGraphProvider(TravelTimeProvider):
+    """
+    Offline travel times from a local road graph, for load tests, CI
+    benchmarks and API outages. Routes are the fastest paths, found with
+    SciPy's compiled Dijkstra run once per distinct origin over a CSR
+    adjacency matrix, a batch of origins at a time to bound memory; the
+    distance of each route is summed along its shortest-path tree.
+    """
+    SOURCE_BATCH = 64 # origins searched per dijkstra call
+
+    def __init__(self, vertices, tails, heads, distances, durations, places=None):
+        """
+        Args:
+            vertices (list): Vertex names, in index order.
+            tails (array-like): Start vertex index of each arc.
+            heads (array-like): End vertex index of each arc.
+            distances (array-like): Length of each arc in meters.
+            durations (array-like): Travel time of each arc in seconds.
+            places (dict, optional): Place ID -> vertex name, snapping places
+                onto the graph. Place IDs that are not in it are looked up as
+                vertex names.
+        """
+        self.vertices = list(vertices)
+        self.vertex_index = {name: i for i, name in enumerate(self.vertices)}
+        self.places = dict(places or {})
+        n = len(self.vertices)
+        tails, heads = np.asarray(tails, dtype=np.intp), np.asarray(heads, dtype=np.intp)
+        distances, durations = np.asarray(distances, dtype=np.float64), np.asarray(durations, dtype=np.float64)
+
+        # keep only the fastest of parallel arcs, since csr_matrix would add them up
+        order = np.lexsort((durations, heads, tails))
+        tails, heads, distances, durations = tails[order], heads[order], distances[order], durations[order]
+        first = np.ones(len(tails), dtype=bool)
+        first[1:] = (tails[1:] != tails[:-1]) | (heads[1:] != heads[:-1])
+        tails, heads, distances, durations = tails[first], heads[first], distances[first], durations[first]
+
+        # zero weights would read as missing arcs
+        self._durations = csr_matrix((np.maximum(durations, 1e-6), (tails, heads)), shape=(n, n))
+        self._arc_keys = tails.astype(np.int64) * n + heads # sorted, to look arcs up by (tail, head)
+        self._arc_distances = distances
+
+    @classmethod
+    def load(cls, path, places=None):
+        """
+        Reads a road graph from a whitespace separated text file with one arc
+        per line: `from to distance_m duration_s [oneway]`. Arcs are two-way
+        unless marked `oneway`; blank lines and lines starting with # are
+        skipped.
+
+        Args:
+            path (str): Path of the file.
+            places (dict, optional): Place ID -> vertex name.
+
+        Returns:
+            RoadGraphProvider: The provider for the graph.
+        """
+        vertex_index = {}
+        tails, heads, distances, durations = [], [], [], []
+        with open(path) as f:
+            for line in f:
+                fields = line.split()
+                if not fields or fields[0].startswith('#'):
+                    continue
+                tail, head, distance, duration = fields[:4]
+                ends = [vertex_index.setdefault(name, len(vertex_index)) for name in (tail, head)]
+                arcs = [ends] if fields[4:5] == ['oneway'] else [ends, ends[::-1]]
+                for u, v in arcs:
+                    tails.append(u)
+                    heads.append(v)
+                    distances.append(float(distance))
+                    durations.append(float(duration))
+        return cls(list(vertex_index), tails, heads, distances, durations, places)
+
+    def _vertex(self, place):
+        return self.vertex_index.get(self.places.get(place, place), -1)
+
+    def route_matrix(self, origins, destinations, routing_preference=None, departure_time=None):
+        distances = np.full((len(origins), len(destinations)), UNKNOWN, dtype=np.int32)
+        durations = np.full((len(origins), len(destinations)), UNKNOWN, dtype=np.int32)
+        origin_vertices = np.array([self._vertex(place) for place in origins], dtype=np.intp)
+        dest_vertices = np.array([self._vertex(place) for place in destinations], dtype=np.intp)
+        known_dests = np.flatnonzero(dest_vertices >= 0)
+        sources = np.unique(origin_vertices[origin_vertices >= 0])
+        if not len(sources) or not len(known_dests):
+            return distances, durations
+
+        targets = dest_vertices[known_dests]
+        times = np.empty((len(sources), len(targets)))
+        lengths = np.empty((len(sources), len(targets)))
+        for start in range(0, len(sources), self.SOURCE_BATCH):
+            batch = slice(start, start + self.SOURCE_BATCH)
+            batch_times, predecessors = dijkstra(self._durations, indices=sources[batch], return_predecessors=True)
+            times[batch] = batch_times[:, targets]
+            lengths[batch] = self._path_lengths(predecessors, targets)
+
+        reachable = np.isfinite(times)
+        source_rows = np.searchsorted(sources, origin_vertices)
+        for i in np.flatnonzero(origin_vertices >= 0):
+            row = source_rows[i]
+            dists = np.where(reachable[row], np.rint(lengths[row]), UNKNOWN)
+            durs = np.where(reachable[row], np.rint(times[row]), UNKNOWN)
+            distances[i, known_dests], durations[i, known_dests] = dists, durs
+        return distances, durations
+
+    def _path_lengths(self, predecessors, targets):
+        """
+        Sums the arc distances along each source's shortest-path tree from
+        every target back to the source, all pairs at once, one hop per step.
+        """
+        n = len(self.vertices)
+        current = np.broadcast_to(targets, (len(predecessors), len(targets))).copy()
+        rows = np.arange(len(predecessors))[:, None]
+        lengths = np.zeros(current.shape)
+        while True:
+            previous = predecessors[rows, current]
+            active = previous >= 0
+            if not active.any():
+                return lengths
+            arcs = np.searchsorted(self._arc_keys, previous[active].astype(np.int64) * n + current[active])
+            lengths[active] += self._arc_distances[arcs]
+            current = np.where(active, previous, current)
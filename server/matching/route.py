@@ -8,6 +8,7 @@ from google.oauth2 import service_account
 import json
 
 load_dotenv()
+ROUTE_OPTIMIZATION_BASE_URL = os.getenv("GOOGLE_ROUTE_OPTIMIZATION_BASE_URL", "https://routeoptimization.googleapis.com")
 
 def get_oauth_token():
     service_info = json.load(open('server/catcharide-456005-b017707003cb.json'))
@@ -44,9 +45,10 @@ def refresh_oauth_token():
         print("Failed to refresh token:", e)
 
 class RouteOptimization:
-    def __init__(self, project_id, oauth_token):
+    def __init__(self, project_id, oauth_token, base_url=None):
         self.project_id = project_id
         self.oauth_token = oauth_token
+        self.base_url = (base_url or ROUTE_OPTIMIZATION_BASE_URL).rstrip('/')
 
     def add_one_day(self, timestamp_str):
         print(timestamp_str)
@@ -87,7 +89,7 @@ class RouteOptimization:
             "populatePolylines": True
         }
         
-        url = f"https://routeoptimization.googleapis.com/v1/projects/{self.project_id}:optimizeTours"
+        url = f"{self.base_url}/v1/projects/{self.project_id}:optimizeTours"
         headers = {
             "Content-Type": "application/json",
             "Authorization": f"Bearer {self.oauth_token}"
@@ -0,0 +1,296 @@
+import multiprocessing
+import os
+import time
+from itertools import count
+from match import Matcher, DriverNode, RiderNode
+from travel_cache import TravelTimeCache
+
+def _shard_worker(conn, matcher_kwargs, cache_path):
+    """
+    Runs in a worker process, holding one Matcher per region assigned to it
+    and running the coordinator's commands in order. Nodes are known by the
+    coordinator's keys, since node objects do not survive pickling.
+
+    'add' and 'remove' get no reply, so the coordinator can stream them 
+    without the pipe filling up; their errors are kept and sent back 
+    instead of the result of the next command that is answered.
+    """
+    cache = TravelTimeCache(cache_path) if cache_path else None
+    shards = {} # region -> Matcher
+    nodes = {} # (region, key) -> this process's copy of the node
+    keys = {} # (region, id(node)) -> key
+    errors = [] # errors of unanswered commands, oldest first
+
+    def shard(region):
+        if region not in shards:
+            shards[region] = Matcher(cache=cache, **matcher_kwargs)
+        return shards[region]
+
+    def listings(region, node, n):
+        return [(keys[region, id(neighbour)], cost) for neighbour, cost in shard(region).sort_listings(node, n)]
+
+    while True:
+        command, *args = conn.recv()
+        if command == 'close':
+            break
+        try:
+            if command == 'add':
+                region, key, is_driver, data = args
+                node = DriverNode(data) if is_driver else RiderNode(data)
+                nodes[region, key] = node
+                keys[region, id(node)] = key
+                shard(region).add_with_location(node)
+                result = None
+            elif command == 'remove':
+                region, key = args
+                node = nodes.pop((region, key))
+                del keys[region, id(node)]
+                matcher = shard(region)
+                matcher.remove_driver(node) if isinstance(node, DriverNode) else matcher.remove_rider(node)
+                result = None
+            elif command == 'sort_listings':
+                region, key, n = args
+                result = listings(region, nodes[region, key], n) if (region, key) in nodes else []
+            elif command == 'flush':
+                for matcher in shards.values():
+                    matcher.flush()
+                result = None
+            elif command == 'expire':
+                now, = args
+                result = []
+                for region, matcher in shards.items():
+                    for node in matcher.expire_departed(now):
+                        key = keys.pop((region, id(node)))
+                        del nodes[region, key]
+                        result.append((region, key))
+            elif command == 'sizes':
+                result = {region: len(matcher.locations) for region, matcher in shards.items()}
+            else:
+                raise ValueError(f"unknown command {command!r}")
+        except Exception as e:
+            errors.append(e)
+            result = None
+        if command in ('add', 'remove'):
+            continue
+        if errors:
+            conn.send((False, errors[0]))
+            errors.clear()
+        else:
+            conn.send((True, result))
+    if cache is not None:
+        cache.close()
+    conn.close()
+
+class ShardedMatcher:
+    """
+    Coordinator that partitions matching into regional shards, each a
+    `Matcher` living in a worker process. Only nodes in the same region
+    get edges, so the travel matrices take the sum of the squares of the
+    regions' location counts instead of the square of the total, and
+    regions are matched on all cores in parallel.
+
+    A node is placed in the shard of its origin's region and, if different,
+    of its destination's region, so trips that cross a border still meet
+    the nodes on both sides. Listings of such nodes are merged across their
+    shards.
+
+    Adds and removals are streamed to the workers without waiting; an error
+    in one is raised by the next call that waits for that worker.
+    """
+    def __init__(self, region, n_workers=None, cache_path=None, **matcher_kwargs):
+        """
+        Args:
+            region (callable): Maps a place ID to a hashable region key, e.g.
+                a geocell of its coordinates or its state.
+            n_workers (int, optional): Worker processes to start. Defaults to
+                the number of CPUs.
+            cache_path (str, optional): Path of a `TravelTimeCache` database
+                shared by every shard. Defaults to no cache.
+            **matcher_kwargs: Passed to each shard's Matcher, e.g. `batch_size`
+                or a picklable `provider`.
+        """
+        self.region = region
+        n_workers = n_workers or os.cpu_count() or 1
+        self._conns = []
+        self._processes = []
+        for _ in range(n_workers):
+            parent_conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_shard_worker, args=(child_conn, matcher_kwargs, cache_path), daemon=True)
+            process.start()
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._processes.append(process)
+        self._worker_of = {} # region -> worker index
+        self._regions_per_worker = [0] * n_workers
+        self._keys = count()
+        self._node_keys = {} # node -> key
+        self._nodes = {} # key -> node
+        self._node_regions = {} # key -> regions of the node's shards
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _worker(self, region):
+        """Returns the worker of a region, assigning new regions to the least loaded worker."""
+        if region not in self._worker_of:
+            worker = min(range(len(self._conns)), key=self._regions_per_worker.__getitem__)
+            self._worker_of[region] = worker
+            self._regions_per_worker[worker] += 1
+        return self._worker_of[region]
+
+    def _send(self, worker, *message):
+        self._conns[worker].send(message)
+
+    def _gather(self, workers):
+        """
+        Waits for one reply from each of `workers`, in order. All replies are 
+        read before an error is raised, so the pipes stay in step.
+
+        Returns:
+            list: The results, one per worker.
+
+        Raises:
+            Exception: The first error raised in the workers since their last reply.
+        """
+        results, error = [], None
+        for worker in workers:
+            ok, result = self._conns[worker].recv()
+            if ok:
+                results.append(result)
+            elif error is None:
+                error = result
+        if error is not None:
+            raise error
+        return results
+
+    def _regions(self, node):
+        return list(dict.fromkeys((self.region(node.origin), self.region(node.destination))))
+
+    def add_with_location(self, node):
+        """
+        Routes a DriverNode or RiderNode to the shards of its regions, which
+        fetch its locations' routes and add it as `Matcher.add_with_location`
+        does. Returns without waiting for the shards.
+
+        Raises:
+            TypeError: If the node is not a DriverNode or RiderNode.
+        """
+        if not isinstance(node, (DriverNode, RiderNode)):
+            raise TypeError(f"Expected a DriverNode or RiderNode, got {type(node).__name__}")
+        if node in self._node_keys:
+            return
+        key = next(self._keys)
+        self._node_keys[node] = key
+        self._nodes[key] = node
+        self._node_regions[key] = self._regions(node)
+        for region in self._node_regions[key]:
+            self._send(self._worker(region), 'add', region, key, isinstance(node, DriverNode), node.data)
+
+    def _remove(self, node):
+        key = self._node_keys.pop(node)
+        del self._nodes[key]
+        for region in self._node_regions.pop(key):
+            self._send(self._worker_of[region], 'remove', region, key)
+
+    def remove_driver(self, node: DriverNode):
+        """
+        Removes a driver from its shards.
+
+        Raises:
+            KeyError: If the driver was not added.
+        """
+        self._remove(node)
+
+    def remove_rider(self, node: RiderNode):
+        """
+        Removes a rider from its shards.
+
+        Raises:
+            KeyError: If the rider was not added.
+        """
+        self._remove(node)
+
+    def flush(self):
+        """Flushes the queued nodes of every shard and waits for all workers."""
+        workers = range(len(self._conns))
+        for worker in workers:
+            self._send(worker, 'flush')
+        self._gather(workers)
+
+    def expire_departed(self, now=None):
+        """
+        Removes every node whose departure time has passed from all shards.
+
+        Args:
+            now (float, optional): POSIX timestamp to compare departures with.
+                Defaults to the current time. Every shard uses the same one, so
+                a node in two shards expires from both.
+
+        Returns:
+            list: The removed nodes.
+        """
+        now = time.time() if now is None else now
+        workers = range(len(self._conns))
+        for worker in workers:
+            self._send(worker, 'expire', now)
+        expired = []
+        for result in self._gather(workers):
+            for _, key in result:
+                node = self._nodes.pop(key, None)
+                if node is None:
+                    continue # already expired from its other shard
+                del self._node_keys[node]
+                del self._node_regions[key]
+                expired.append(node)
+        return expired
+
+    def sort_listings(self, node, n):
+        """
+        Returns the `n` cheapest listings of a node across its shards, as
+        `Matcher.sort_listings` does. Waits for earlier commands to the
+        node's shards to finish first.
+
+        Returns:
+            list: (listing, (total, excess)) tuples sorted by total cost.
+        """
+        key = self._node_keys.get(node)
+        if key is None:
+            return []
+        workers = []
+        for region in self._node_regions[key]:
+            workers.append(self._worker_of[region])
+            self._send(workers[-1], 'sort_listings', region, key, n)
+        best = {}
+        for result in self._gather(workers):
+            for neighbour_key, cost in result:
+                if neighbour_key in self._nodes and (neighbour_key not in best or cost < best[neighbour_key]):
+                    best[neighbour_key] = cost
+        ranked = sorted(best.items(), key=lambda item: item[1][0])[:n]
+        return [(self._nodes[neighbour_key], cost) for neighbour_key, cost in ranked]
+
+    def shard_sizes(self):
+        """
+        Returns:
+            dict: Region -> number of locations in its shard's matrix.
+        """
+        workers = range(len(self._conns))
+        for worker in workers:
+            self._send(worker, 'sizes')
+        sizes = {}
+        for result in self._gather(workers):
+            sizes.update(result)
+        return sizes
+
+    def close(self):
+        """Stops the worker processes."""
+        for worker, conn in enumerate(self._conns):
+            if self._processes[worker].is_alive():
+                conn.send(('close',))
+            conn.close()
+        for process in self._processes:
+            process.join()
+        self._conns, self._processes = [], []
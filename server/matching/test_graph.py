@@ -0,0 +1,50 @@
+import pytest
+import numpy as np
+from graph import MatchGraph
+from match import DriverNode, RiderNode
+
+@pytest.fixture
+def graph():
+    return MatchGraph()
+
+def test_add_edges_both_directions(graph):
+    driver = DriverNode({'origin': 'a', 'destination': 'b'})
+    riders = [RiderNode({'origin': 'a', 'destination': 'b'}) for _ in range(3)]
+    graph.add_node(driver, is_driver=True)
+    for rider in riders:
+        graph.add_node(rider, is_driver=False)
+    graph.add_edges(driver, riders, np.array([3.0, 1.0, 2.0]), np.array([0.5, 0.0, 0.25]))
+    assert sorted(graph.edge_list(driver), key=lambda x: x[1]) == [
+        (riders[1], (1.0, 0.0)), (riders[2], (2.0, 0.25)), (riders[0], (3.0, 0.5))]
+    assert graph.edge_list(riders[2]) == [(driver, (2.0, 0.25))]
+
+def test_remove_node_reuses_ids(graph):
+    driver = DriverNode({'origin': 'a', 'destination': 'b'})
+    rider = RiderNode({'origin': 'a', 'destination': 'b'})
+    graph.add_node(driver, is_driver=True)
+    graph.add_node(rider, is_driver=False)
+    graph.add_edges(rider, [driver], np.array([1.0]), np.array([0.0]))
+    rider_id = rider.id
+    assert graph.remove_node(rider) == [driver]
+    assert rider not in graph and rider.id == -1
+    assert graph.degree(driver) == 0
+    other = RiderNode({'origin': 'a', 'destination': 'b'})
+    graph.add_node(other, is_driver=False)
+    assert other.id == rider_id
+    with pytest.raises(KeyError):
+        graph.remove_node(rider)
+
+def test_compaction_keeps_live_edges(graph):
+    drivers = [DriverNode({'origin': 'a', 'destination': 'b'}) for _ in range(60)]
+    riders = [RiderNode({'origin': 'a', 'destination': 'b'}) for _ in range(60)]
+    for driver in drivers:
+        graph.add_node(driver, is_driver=True)
+    for i, rider in enumerate(riders):
+        graph.add_node(rider, is_driver=False)
+        graph.add_edges(rider, drivers, np.full(60, float(i)), np.zeros(60))
+    for rider in riders[:40]:
+        graph.remove_node(rider)
+    assert graph.n_edges < 60 * 60
+    assert graph.n_edges - graph.n_dead == 20 * 60
+    assert sorted(cost[0] for _, cost in graph.edge_list(drivers[7])) == [float(i) for i in range(40, 60)]
+    assert graph.edge_list(riders[50]) == [(driver, (50.0, 0.0)) for driver in drivers]
@@ -0,0 +1,52 @@
+import pytest
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import csr_matrix
+from lap import LAPSolver, compare_with_scipy
+
+@pytest.fixture
+def solver():
+    return LAPSolver()
+
+def objective(cost, rows, cols):
+    return cost[rows, cols].sum()
+
+@pytest.mark.parametrize("shape", [(5, 5), (4, 7), (7, 4)])
+def test_matches_scipy(solver, shape):
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        cost = rng.integers(0, 20, size=shape).astype(float)
+        rows, cols = solver.solve(cost, warm_start=False)
+        assert len(rows) == min(shape)
+        assert objective(cost, rows, cols) == objective(cost, *linear_sum_assignment(cost))
+
+def test_warm_start_after_changes(solver):
+    rng = np.random.default_rng(1)
+    cost = rng.uniform(0, 100, size=(30, 40))
+    solver.solve(cost)
+    for _ in range(10):
+        cost[rng.integers(30)] = rng.uniform(0, 100, size=40)
+        rows, cols = solver.solve(cost)
+        assert objective(cost, rows, cols) == pytest.approx(objective(cost, *linear_sum_assignment(cost)))
+
+def test_warm_start_with_keys(solver):
+    cost = np.array([[1, 5, 9], [4, 2, 8], [7, 6, 3]], dtype=float)
+    solver.solve(cost, row_keys=['a', 'b', 'c'], col_keys=['x', 'y', 'z'])
+    # drop row 'a' and put the columns in a different order
+    rows, cols = solver.solve(cost[1:, ::-1], row_keys=['b', 'c'], col_keys=['z', 'y', 'x'])
+    assert list(cols) == [1, 0]
+
+def test_sparse_and_forbidden(solver):
+    dense = np.array([[np.inf, 2, 3], [1, np.inf, np.inf]])
+    rows, cols = solver.solve(dense, warm_start=False)
+    assert list(cols) == [1, 0]
+    rows, cols = solver.solve(csr_matrix(np.where(np.isinf(dense), 0, dense)), warm_start=False)
+    assert list(cols) == [1, 0]
+
+def test_infeasible(solver):
+    with pytest.raises(ValueError):
+        solver.solve(np.array([[1, np.inf], [2, np.inf]]))
+
+def test_compare_with_scipy():
+    results = compare_with_scipy(40, 60, n_changes=3)
+    assert results['lap_objective'] == pytest.approx(results['scipy_objective'])
@@ -1,10 +1,39 @@
+import os
 import pytest
-from match import Matcher, DriverNode, RiderNode
+import numpy as np
+from heapq import nsmallest
+from match import Matcher, DriverNode, RiderNode, UNKNOWN
+from travel_cache import TravelTimeCache
+from benchmark import workload_matcher
+from workload import generate_workload
 
 @pytest.fixture
 def matcher():
     return Matcher()
 
+def fake_route_matrix(durations, requests_made=None):
+    """
+    Stands in for GoogleRoutesProvider._compute_route_matrix, answering from a dict of 
+    (origin, destination) -> seconds; pairs missing from it have no route.
+    """
+    def compute_route_matrix(origins, destinations, routing_preference=None, departure_time=None):
+        if requests_made is not None:
+            requests_made.append((list(origins), list(destinations)))
+        elements = []
+        for i, origin in enumerate(origins):
+            for j, destination in enumerate(destinations):
+                element = {'originIndex': i, 'destinationIndex': j}
+                if origin == destination:
+                    element['duration'] = '0s'
+                elif (origin, destination) in durations:
+                    element['duration'] = f"{durations[origin, destination]}s"
+                    element['distanceMeters'] = durations[origin, destination] * 10
+                else:
+                    element['condition'] = 'ROUTE_NOT_FOUND'
+                elements.append(element)
+        return elements
+    return compute_route_matrix
+
 def test_add_location(matcher):
     matcher.add_location("place_id:ChIJfdcUqp1AwFQRvsC9Io-ADdc")
     assert "place_id:ChIJfdcUqp1AwFQRvsC9Io-ADdc" in matcher.locations
@@ -19,14 +48,16 @@ def test_add_rider(matcher):
     matcher.add_rider(rider)
     assert rider in matcher._revgraph
 
-def test_add_with_location_driver(matcher):
+def test_add_with_location_driver(matcher, monkeypatch):
+    monkeypatch.setattr(matcher.provider, '_compute_route_matrix', fake_route_matrix({}))
     driver = DriverNode({'origin': 'place_id:ChIJfdcUqp1AwFQRvsC9Io-ADdc', 'destination': 'place_id:ChIJJ3SpfQsLlVQRkYXR9ua5Nhw'})
     matcher.add_with_location(driver)
     assert driver in matcher._graph
     assert 'place_id:ChIJfdcUqp1AwFQRvsC9Io-ADdc' in matcher.locations
     assert 'place_id:ChIJJ3SpfQsLlVQRkYXR9ua5Nhw' in matcher.locations
 
-def test_add_with_location_rider(matcher):
+def test_add_with_location_rider(matcher, monkeypatch):
+    monkeypatch.setattr(matcher.provider, '_compute_route_matrix', fake_route_matrix({}))
     rider = RiderNode({'origin': 'place_id:ChIJv0fYEV4XwFQRAKdgafDZ1R8', 'destination': 'place_id:ChIJ-RRZyGOvlVQR8-ORLBHVVoQ'})
     matcher.add_with_location(rider)
     print(matcher._revgraph)
@@ -57,7 +88,659 @@ def test_sort_listings(matcher):
     rider = RiderNode({'origin': 'place_id:ChIJv0fYEV4XwFQRAKdgafDZ1R8', 'destination': 'place_id:ChIJ-RRZyGOvlVQR8-ORLBHVVoQ'})
     driver1 = DriverNode({'origin': 'place_id:ChIJfdcUqp1AwFQRvsC9Io-ADdc', 'destination': 'place_id:ChIJJ3SpfQsLlVQRkYXR9ua5Nhw'})
     driver2 = DriverNode({'origin': 'place_id:ChIJ-RRZyGOvlVQR8-ORLBHVVoQ', 'destination': 'place_id:ChIJJ3SpfQsLlVQRkYXR9ua5Nhw'})
-    matcher._revgraph[rider] = {(driver1, (10, 9)), (driver2, (5, 3))}
+    matcher.locations = [
+        'place_id:ChIJfdcUqp1AwFQRvsC9Io-ADdc',
+        'place_id:ChIJv0fYEV4XwFQRAKdgafDZ1R8',
+        'place_id:ChIJ-RRZyGOvlVQR8-ORLBHVVoQ',
+        'place_id:ChIJJ3SpfQsLlVQRkYXR9ua5Nhw'
+    ]
+    matcher.distance_matrix = [
+        [(0, 0), (5000, 3000), (5000, 3000), (5000, 3000)],
+        [(5000, 3000), (0, 0), (1000, 600), (2000, 1200)],
+        [(5000, 3000), (1000, 600), (0, 0), (1000, 600)],
+        [(5000, 3000), (2000, 1200), (1000, 600), (0, 0)]
+    ]
+    matcher.add_rider(rider)
+    matcher.add_driver(driver1)
+    matcher.add_driver(driver2)
     top_listings = matcher.sort_listings(rider, 1)
     assert len(top_listings) == 1
-    assert top_listings[0][0] == driver2
\ No newline at end of file
+    assert top_listings[0][0] == driver2
+
+def test_distance_matrix_is_numeric(matcher):
+    matcher.distance_matrix = [
+        [(0, 0), (1000, 600)],
+        [(1000, 600), (0, 0)]
+    ]
+    assert matcher.durations.dtype == np.int32
+    assert matcher.distances[0].flags['C_CONTIGUOUS']
+    assert matcher.durations[0, 1] == 600
+    assert tuple(matcher.distance_matrix[1][0]) == (1000, 600)
+
+def test_update_distance_matrix(matcher, monkeypatch):
+    # no route between b and c
+    monkeypatch.setattr(matcher.provider, '_compute_route_matrix', fake_route_matrix({('c', 'a'): 600, ('a', 'c'): 700}))
+    matcher.locations = ['a', 'b']
+    matcher.distance_matrix = [
+        [(0, 0), (500, 300)],
+        [(500, 300), (0, 0)]
+    ]
+    matcher.add_location('c', update=True)
+    assert matcher.durations.shape == (3, 3)
+    assert matcher.durations[2, 0] == 600
+    assert matcher.durations[0, 2] == 700
+    assert matcher.durations[2, 1] == matcher.durations[1, 2] == UNKNOWN
+    assert matcher.durations[2, 2] == 0
+    assert matcher.durations[0, 1] == 300
+
+def test_calc_cost_unknown(matcher):
+    matcher.locations = ['a', 'b']
+    matcher.distance_matrix = [
+        [(0, 0), (UNKNOWN, UNKNOWN)],
+        [(UNKNOWN, UNKNOWN), (0, 0)]
+    ]
+    rider = RiderNode({'origin': 'a', 'destination': 'b'})
+    driver = DriverNode({'origin': 'a', 'destination': 'b'})
+    assert matcher.calc_cost(rider, driver) == (float('inf'), float('inf'))
+
+def test_location_index(matcher):
+    matcher.add_location('a')
+    matcher.add_location('b')
+    matcher.add_location('a')
+    matcher.add_location('c')
+    assert matcher.locations == ['a', 'b', 'c']
+    assert [matcher.location_index(loc) for loc in 'abc'] == [0, 1, 2]
+    matcher.locations = ['c', 'a']
+    assert matcher.location_index('a') == 1
+    with pytest.raises(KeyError):
+        matcher.location_index('b')
+
+def test_compute_cost_matrix(matcher):
+    matcher.locations = ['a', 'b', 'c', 'd']
+    matcher.distance_matrix = [
+        [(0, 0), (1000, 600), (2000, 1200), (3000, 1800)],
+        [(1000, 600), (0, 0), (1500, 900), (2500, 1500)],
+        [(2000, 1200), (1500, 900), (0, 0), (UNKNOWN, UNKNOWN)],
+        [(3000, 1800), (2500, 1500), (UNKNOWN, UNKNOWN), (0, 0)]
+    ]
+    # the third rider makes the same trip as the first and shares its row
+    riders = [RiderNode({'origin': 'b', 'destination': 'c'}), RiderNode({'origin': 'a', 'destination': 'b'}),
+              RiderNode({'origin': 'b', 'destination': 'c'})]
+    drivers = [DriverNode({'origin': 'a', 'destination': 'd'}), DriverNode({'origin': 'b', 'destination': 'c'})]
+    _, _, total, excess = matcher.compute_cost_matrix(riders, drivers)
+    assert total.shape == excess.shape == (3, 2)
+    for i, rider in enumerate(riders):
+        for j, driver in enumerate(drivers):
+            assert (total[i, j], excess[i, j]) == pytest.approx(matcher.calc_cost(rider, driver))
+
+def test_add_rider_costs_existing_drivers(matcher):
+    matcher.locations = ['a', 'b']
+    matcher.distance_matrix = [
+        [(0, 0), (1000, 600)],
+        [(1000, 600), (0, 0)]
+    ]
+    driver = DriverNode({'origin': 'a', 'destination': 'b'})
+    rider = RiderNode({'origin': 'a', 'destination': 'b'})
+    matcher.add_driver(driver)
+    matcher.add_rider(rider)
+    assert matcher._revgraph[rider] == {(driver, (0.0, 0.0))}
+    assert matcher._graph[driver] == {(rider, (0.0, 0.0))}
+
+def test_assign(matcher):
+    matcher.locations = ['a', 'b', 'c']
+    matcher.distance_matrix = [
+        [(0, 0), (1000, 600), (2000, 1200)],
+        [(1000, 600), (0, 0), (1000, 600)],
+        [(2000, 1200), (1000, 600), (0, 0)]
+    ]
+    near = DriverNode({'origin': 'a', 'destination': 'c', 'available_seats': 1})
+    far = DriverNode({'origin': 'c', 'destination': 'a', 'available_seats': 1})
+    rider1 = RiderNode({'origin': 'a', 'destination': 'c'})
+    rider2 = RiderNode({'origin': 'a', 'destination': 'b'})
+    for node in (near, far):
+        matcher.add_driver(node)
+    for node in (rider1, rider2):
+        matcher.add_rider(node)
+
+    # Both riders rank `near` first, but it only has one seat
+    assert matcher.sort_listings(rider1, 1)[0][0] == near
+    assert matcher.sort_listings(rider2, 1)[0][0] == near
+    pairs, total_cost = matcher.assign()
+    assert set(pairs) == {(rider1, near), (rider2, far)}
+    assert total_cost == pytest.approx(sum(matcher.calc_cost(r, d)[0] for r, d in pairs))
+
+    pairs, _ = matcher.assign(max_excess=10)
+    assert pairs == [(rider1, near)]
+
+def test_assign_warm_start(matcher):
+    matcher.locations = ['a', 'b', 'c']
+    matcher.distance_matrix = [
+        [(0, 0), (1000, 600), (2000, 1200)],
+        [(1000, 600), (0, 0), (1000, 600)],
+        [(2000, 1200), (1000, 600), (0, 0)]
+    ]
+    matcher.add_driver(DriverNode({'origin': 'a', 'destination': 'c', 'available_seats': 2}))
+    matcher.add_driver(DriverNode({'origin': 'c', 'destination': 'a', 'available_seats': 1}))
+    for origin, destination in [('a', 'c'), ('a', 'b'), ('b', 'c')]:
+        matcher.add_rider(RiderNode({'origin': origin, 'destination': destination}))
+    cold_pairs, cold_cost = matcher.assign()
+    warm_pairs, warm_cost = matcher.assign(warm_start=True)
+    assert warm_cost == pytest.approx(cold_cost)
+    matcher.add_rider(RiderNode({'origin': 'c', 'destination': 'a'}))
+    assert matcher.assign(warm_start=True)[1] == pytest.approx(matcher.assign()[1])
+
+@pytest.fixture
+def line_matcher():
+    # a - b - c, ten minutes apart
+    matcher = Matcher()
+    matcher.locations = ['a', 'b', 'c']
+    matcher.distance_matrix = [
+        [(0, 0), (1000, 600), (2000, 1200)],
+        [(1000, 600), (0, 0), (1000, 600)],
+        [(2000, 1200), (1000, 600), (0, 0)]
+    ]
+    return matcher
+
+@pytest.fixture
+def workload_graph_matcher():
+    # 15 offers and 40 requests among 30 places, all added to the graph
+    workload = generate_workload(15, 40, n_places=30, seed=4)
+    matcher = workload_matcher(workload, departure_window=3 * 60 * 60, max_excess=90)
+    for offer in workload['offers']:
+        matcher.add_driver(DriverNode(offer))
+    for request in workload['requests']:
+        matcher.add_rider(RiderNode(request))
+    return matcher
+
+def test_matching_maintained_on_arrival(line_matcher):
+    rider1 = RiderNode({'origin': 'a', 'destination': 'c'})
+    rider2 = RiderNode({'origin': 'a', 'destination': 'b'})
+    line_matcher.add_rider(rider1)
+    assert line_matcher.matching == {}
+    driver = DriverNode({'origin': 'a', 'destination': 'c', 'available_seats': 1})
+    line_matcher.add_driver(driver)
+    assert line_matcher.matching == {rider1: driver}
+    line_matcher.add_rider(rider2)
+    assert rider2 not in line_matcher.matching
+
+def test_matching_after_removals(line_matcher):
+    near = DriverNode({'origin': 'a', 'destination': 'c', 'available_seats': 1})
+    far = DriverNode({'origin': 'c', 'destination': 'a', 'available_seats': 1})
+    rider1 = RiderNode({'origin': 'a', 'destination': 'c'})
+    rider2 = RiderNode({'origin': 'a', 'destination': 'b'})
+    line_matcher.add_driver(near)
+    line_matcher.add_rider(rider1)
+    line_matcher.add_driver(far)
+    line_matcher.add_rider(rider2)
+    assert line_matcher.matching == {rider1: near, rider2: far}
+
+    line_matcher.remove_driver(near)
+    assert near not in line_matcher._graph
+    assert all(driver is not near for driver, _ in line_matcher._revgraph[rider1])
+    assert line_matcher.matching == {rider2: far}
+
+    line_matcher.remove_rider(rider2)
+    assert rider2 not in line_matcher._revgraph
+    assert line_matcher.matching == {rider1: far}
+
+def test_set_available_seats(line_matcher):
+    driver = DriverNode({'origin': 'a', 'destination': 'c', 'available_seats': 2})
+    rider1 = RiderNode({'origin': 'a', 'destination': 'c'})
+    rider2 = RiderNode({'origin': 'c', 'destination': 'a'})
+    line_matcher.add_rider(rider1)
+    line_matcher.add_rider(rider2)
+    line_matcher.add_driver(driver)
+    assert set(line_matcher.matching) == {rider1, rider2}
+
+    line_matcher.set_available_seats(driver, 1)
+    assert line_matcher.matching == {rider1: driver}
+    line_matcher.set_available_seats(driver, 3)
+    assert set(line_matcher.matching) == {rider1, rider2}
+
+    # a driver that is not in the graph, or no longer, has no edges to repair
+    line_matcher.remove_driver(driver)
+    other = DriverNode({'origin': 'a', 'destination': 'b'})
+    line_matcher.add_driver(other) # reuses the removed driver's ID
+    for node in (driver, DriverNode({'origin': 'a', 'destination': 'c'})):
+        with pytest.raises(KeyError):
+            line_matcher.set_available_seats(node, 1)
+    assert all(isinstance(driver, DriverNode) and isinstance(rider, RiderNode)
+               for rider, driver in line_matcher.matching.items())
+
+def test_matching_respects_max_excess(line_matcher):
+    line_matcher.max_excess = 10
+    line_matcher.add_driver(DriverNode({'origin': 'a', 'destination': 'c'}))
+    line_matcher.add_rider(RiderNode({'origin': 'c', 'destination': 'a'}))
+    assert line_matcher.matching == {}
+
+def test_add_location_one_at_a_time(matcher, monkeypatch):
+    durations = {(o, d): 60 for o in 'abc' for d in 'abc'}
+    monkeypatch.setattr(matcher.provider, '_compute_route_matrix', fake_route_matrix(durations))
+    for location in 'abc':
+        matcher.add_location(location, update=True)
+    assert (matcher.durations == 60 * (1 - np.eye(3))).all()
+
+def test_add_locations(matcher, monkeypatch):
+    requests_made = []
+    durations = {(o, d): 60 for o in 'abcd' for d in 'abcd'}
+    monkeypatch.setattr(matcher.provider, '_compute_route_matrix', fake_route_matrix(durations, requests_made))
+    matcher.add_locations(['a', 'b', 'a'], update=True)
+    matcher.add_locations(['b', 'c', 'd'], update=True)
+    assert matcher.locations == ['a', 'b', 'c', 'd']
+    assert requests_made == [(['a', 'b'], ['a', 'b']),
+                             (['c', 'd'], ['a', 'b', 'c', 'd']), (['a', 'b'], ['c', 'd'])]
+    assert (matcher.durations == 60 * (1 - np.eye(4))).all()
+
+def test_route_matrix_chunks_respect_limits(matcher, monkeypatch):
+    requests_made = []
+    places = [f'p{i}' for i in range(60)]
+    durations = {(o, d): 60 for o in places for d in places}
+    monkeypatch.setattr(matcher.provider, '_compute_route_matrix', fake_route_matrix(durations, requests_made))
+    matcher.add_locations(places, update=True)
+    assert all(len(o) * len(d) <= 625 and len(o) + len(d) <= 50 for o, d in requests_made)
+    assert sum(len(o) * len(d) for o, d in requests_made) == 60 * 60
+    assert (matcher.durations == 60 * (1 - np.eye(60))).all()
+
+def test_add_with_location_batches(monkeypatch):
+    matcher = Matcher(batch_size=3)
+    requests_made = []
+    monkeypatch.setattr(matcher.provider, '_compute_route_matrix', fake_route_matrix({}, requests_made))
+    driver = DriverNode({'origin': 'a', 'destination': 'b'})
+    rider1 = RiderNode({'origin': 'a', 'destination': 'c'})
+    rider2 = RiderNode({'origin': 'b', 'destination': 'c'})
+    matcher.add_with_location(driver)
+    matcher.add_with_location(rider1)
+    assert requests_made == [] and driver not in matcher._graph
+    matcher.add_with_location(rider2)
+    assert requests_made == [(['a', 'b', 'c'], ['a', 'b', 'c'])]
+    assert driver in matcher._graph and rider1 in matcher._revgraph and rider2 in matcher._revgraph
+
+def test_flush_interval_on_read(monkeypatch):
+    matcher = Matcher(batch_size=10, flush_interval=60)
+    durations = {(o, d): 60 for o in 'ab' for d in 'ab'}
+    monkeypatch.setattr(matcher.provider, '_compute_route_matrix', fake_route_matrix(durations))
+    clock = [1000.0]
+    monkeypatch.setattr('match.time.monotonic', lambda: clock[0])
+    matcher._last_flush = clock[0]
+    driver = DriverNode({'origin': 'a', 'destination': 'b'})
+    rider = RiderNode({'origin': 'a', 'destination': 'b'})
+    matcher.add_with_location(driver)
+    matcher.add_with_location(rider)
+    assert matcher.sort_listings(rider, 1) == []
+    clock[0] += 60
+    # no further node arrives; reading the listings flushes the due queue
+    assert matcher.sort_listings(rider, 1) == [(driver, (0.0, 0.0))]
+    assert matcher.matching == {rider: driver}
+
+def test_remove_queued_nodes(monkeypatch):
+    matcher = Matcher(batch_size=3)
+    durations = {(o, d): 60 for o in 'abc' for d in 'abc'}
+    monkeypatch.setattr(matcher.provider, '_compute_route_matrix', fake_route_matrix(durations))
+    driver = DriverNode({'origin': 'a', 'destination': 'b'})
+    rider = RiderNode({'origin': 'a', 'destination': 'b'})
+    matcher.add_with_location(driver)
+    matcher.add_with_location(rider)
+    matcher.remove_rider(rider)
+    matcher.remove_driver(driver)
+    with pytest.raises(KeyError):
+        matcher.remove_rider(rider)
+    matcher.add_with_location(DriverNode({'origin': 'b', 'destination': 'c'}))
+    matcher.add_with_location(RiderNode({'origin': 'b', 'destination': 'c'}))
+    matcher.add_with_location(RiderNode({'origin': 'a', 'destination': 'c'}))
+    assert rider not in matcher.graph and driver not in matcher.graph
+    assert rider not in matcher.matching
+
+def test_cache_skips_known_pairs(tmp_path, monkeypatch):
+    durations = {(o, d): 60 for o in 'abc' for d in 'abc'}
+    cache = TravelTimeCache(str(tmp_path / "cache.sqlite3"))
+    first = Matcher(cache=cache)
+    monkeypatch.setattr(first.provider, '_compute_route_matrix', fake_route_matrix(durations))
+    first.add_locations(['a', 'b'], update=True)
+
+    requests_made = []
+    second = Matcher(cache=cache)
+    monkeypatch.setattr(second.provider, '_compute_route_matrix', fake_route_matrix(durations, requests_made))
+    second.add_locations(['a', 'b', 'c'], update=True)
+    # only pairs involving the uncached place are requested
+    assert sorted(requests_made) == [(['a', 'b'], ['c']), (['c'], ['a', 'b', 'c'])]
+    assert (second.durations == 60 * (1 - np.eye(3))).all()
+
+    # routes fetched with another routing preference are not reused
+    requests_made.clear()
+    third = Matcher(cache=cache)
+    monkeypatch.setattr(third.provider, '_compute_route_matrix', fake_route_matrix(durations, requests_made))
+    third.locations = ['a', 'b']
+    third.calc_initial_distance_matrix()
+    assert requests_made == [(['a', 'b'], ['a', 'b'])]
+    cache.close()
+
+def test_cache_skips_element_errors(tmp_path, monkeypatch):
+    cache = TravelTimeCache(str(tmp_path / "cache.sqlite3"))
+    first = Matcher(cache=cache)
+    answer = fake_route_matrix({('a', 'b'): 60})
+
+    def compute_route_matrix(origins, destinations, routing_preference=None, departure_time=None):
+        # b -> a fails for this request only
+        return [element if (origins[element['originIndex']], destinations[element['destinationIndex']]) != ('b', 'a')
+                else {**element, 'condition': None, 'status': {'code': 14}}
+                for element in answer(origins, destinations)]
+    monkeypatch.setattr(first.provider, '_compute_route_matrix', compute_route_matrix)
+    first.add_locations(['a', 'b'], update=True)
+    assert first.durations[1, 0] == UNKNOWN
+
+    requests_made = []
+    second = Matcher(cache=cache)
+    monkeypatch.setattr(second.provider, '_compute_route_matrix',
+                        fake_route_matrix({('a', 'b'): 60, ('b', 'a'): 90}, requests_made))
+    second.add_locations(['a', 'b'], update=True)
+    assert requests_made == [(['b'], ['a'])]
+    assert second.durations[1, 0] == 90
+    cache.close()
+
+def test_departure_window(line_matcher):
+    line_matcher.departure_window = 2 * 60 * 60
+    morning = DriverNode({'origin': 'a', 'destination': 'c', 'departure_time': '2025-04-19T08:00:00'})
+    evening = DriverNode({'origin': 'a', 'destination': 'c', 'departure_time': '2025-04-19T19:00:00'})
+    anytime = DriverNode({'origin': 'a', 'destination': 'c', 'available_seats': 0})
+    for driver in (morning, evening, anytime):
+        line_matcher.add_driver(driver)
+    rider = RiderNode({'origin': 'a', 'destination': 'c', 'departure_time': '2025-04-19T09:30:00'})
+    line_matcher.add_rider(rider)
+    assert {driver for driver, _ in line_matcher._revgraph[rider]} == {morning, anytime}
+
+    line_matcher.remove_driver(morning)
+    late_rider = RiderNode({'origin': 'a', 'destination': 'c', 'departure_time': '2025-04-19T08:30:00'})
+    line_matcher.add_rider(late_rider)
+    assert {driver for driver, _ in line_matcher._revgraph[late_rider]} == {anytime}
+
+    pairs, _ = line_matcher.assign()
+    assert pairs == []
+
+def test_top_k_listings_follow_edges(line_matcher):
+    line_matcher.top_k = 2
+    rider = RiderNode({'origin': 'a', 'destination': 'b'})
+    line_matcher.add_rider(rider)
+    drivers = [DriverNode({'origin': origin, 'destination': destination})
+               for origin, destination in [('c', 'a'), ('a', 'b'), ('a', 'c'), ('b', 'c')]]
+    for driver in drivers:
+        line_matcher.add_driver(driver)
+    expected = nsmallest(4, line_matcher._revgraph[rider], key=lambda x: x[1][0])
+    assert line_matcher.sort_listings(rider, 2) == expected[:2]
+    assert line_matcher.sort_listings(rider, 4) == expected
+
+    line_matcher.remove_driver(expected[0][0])
+    assert line_matcher.sort_listings(rider, 2) == expected[1:3]
+    assert line_matcher.sort_listings(drivers[2], 1) == [(rider, (10.0, 0.0))]
+
+def test_unused_locations_are_collected(line_matcher, monkeypatch):
+    durations = {(o, d): 600 for o in 'abcdefg' for d in 'abcdefg'}
+    monkeypatch.setattr(line_matcher.provider, '_compute_route_matrix', fake_route_matrix(durations))
+    driver = DriverNode({'origin': 'a', 'destination': 'c'})
+    rider1 = RiderNode({'origin': 'd', 'destination': 'e'})
+    rider2 = RiderNode({'origin': 'f', 'destination': 'g'})
+    for node in (driver, rider1, rider2):
+        line_matcher.add_with_location(node)
+    assert line_matcher.locations == list('abcdefg')
+
+    line_matcher.remove_rider(rider1)
+    assert line_matcher.locations == list('abcdefg')
+    line_matcher.remove_rider(rider2)
+    # d, e, f and g are unused now; a, b and c were added by the caller and stay
+    assert line_matcher.locations == ['a', 'b', 'c']
+    assert line_matcher.durations.tolist() == [[0, 600, 1200], [600, 0, 600], [1200, 600, 0]]
+
+    line_matcher.add_with_location(DriverNode({'origin': 'd', 'destination': 'b'}))
+    assert line_matcher.locations == ['a', 'b', 'c', 'd']
+    assert line_matcher.durations[3].tolist() == [600, 600, 600, 0]
+
+def test_preloaded_locations_survive_compaction(line_matcher):
+    driver = DriverNode({'origin': 'a', 'destination': 'c'})
+    line_matcher.add_driver(driver)
+    line_matcher.remove_driver(driver)
+    line_matcher.compact_locations()
+    assert line_matcher.locations == ['a', 'b', 'c']
+    line_matcher.add_driver(driver)
+    rider = RiderNode({'origin': 'a', 'destination': 'b'})
+    line_matcher.add_rider(rider)
+    assert line_matcher.calc_cost(rider, driver) == (10.0, 0.0)
+
+def test_expire_departed(line_matcher):
+    early = DriverNode({'origin': 'a', 'destination': 'c', 'departure_time': '2025-04-19T08:00:00'})
+    late = DriverNode({'origin': 'a', 'destination': 'c', 'departure_time': '2025-04-19T10:00:00'})
+    rider = RiderNode({'origin': 'a', 'destination': 'c', 'departure_time': '2025-04-19T08:30:00'})
+    untimed = RiderNode({'origin': 'a', 'destination': 'b'})
+    for node in (early, late):
+        line_matcher.add_driver(node)
+    for node in (rider, untimed):
+        line_matcher.add_rider(node)
+    now = late.departure - 60
+    assert line_matcher.expire_departed(now) == [rider, early]
+    assert list(line_matcher._graph) == [late]
+    assert list(line_matcher._revgraph) == [untimed]
+    assert line_matcher.matching == {untimed: late}
+
+def test_insertion_cost(line_matcher):
+    driver = DriverNode({'origin': 'a', 'destination': 'c', 'available_seats': 1})
+    rider1 = RiderNode({'origin': 'a', 'destination': 'c'})
+    rider2 = RiderNode({'origin': 'b', 'destination': 'a'})
+    line_matcher.add_driver(driver)
+    line_matcher.add_rider(rider1)
+    line_matcher.add_rider(rider2)
+    assert line_matcher.insertion_cost(driver, rider1) == (0.0, 0, 1)
+    assert line_matcher.insertion_cost(driver, rider2) == (20.0, 0, 1) # a -> b -> a -> c
+    assert line_matcher.insert_rider(driver, rider1) == 0.0
+    assert line_matcher.route(driver) == [(rider1, True), (rider1, False)]
+
+    # the car is full between rider1's stops, so rider2 must ride before the pickup at a
+    assert line_matcher.insertion_cost(driver, rider2) == (20.0, 0, 1)
+    line_matcher.set_available_seats(driver, 2)
+    line_matcher.remove_rider(rider1)
+    assert line_matcher.route(driver) == []
+
+def test_insertion_cost_skips_only_unknown_legs():
+    # a x b c y d on a line, a minute apart
+    matcher = Matcher()
+    matcher.locations = list('axbcyd')
+    positions = np.arange(6)
+    durations = 60 * np.abs(positions[:, None] - positions[None, :])
+    durations[1, 5] = UNKNOWN # x -> d, only needed to pick up at x on the last leg
+    matcher.distance_matrix = np.stack((durations * 10, durations), axis=-1)
+    driver = DriverNode({'origin': 'a', 'destination': 'd', 'available_seats': 2})
+    rider1 = RiderNode({'origin': 'b', 'destination': 'c'})
+    rider2 = RiderNode({'origin': 'x', 'destination': 'y'})
+    matcher.add_driver(driver)
+    matcher.add_rider(rider1)
+    matcher.add_rider(rider2)
+    matcher.insert_rider(driver, rider1)
+    assert matcher.insertion_cost(driver, rider2) == (0.0, 0, 3) # a -> x -> b -> c -> y -> d
+
+def test_pooled_listings_follow_routes(line_matcher):
+    busy = DriverNode({'origin': 'a', 'destination': 'c', 'available_seats': 2})
+    idle = DriverNode({'origin': 'c', 'destination': 'a', 'available_seats': 2})
+    rider1 = RiderNode({'origin': 'a', 'destination': 'b'})
+    rider2 = RiderNode({'origin': 'b', 'destination': 'c'})
+    for driver in (busy, idle):
+        line_matcher.add_driver(driver)
+    line_matcher.add_rider(rider1)
+    line_matcher.add_rider(rider2)
+    line_matcher.insert_rider(busy, rider1)
+    assert line_matcher.sort_pooled_listings(rider2, 2) == [(busy, (0.0, 2, 3)), (idle, (20.0, 0, 1))]
+    line_matcher.max_excess = 15
+    assert line_matcher.sort_pooled_listings(rider2, 2) == [(busy, (0.0, 2, 3))]
+    line_matcher.remove_driver(busy)
+    assert line_matcher.route(busy) == []
+    line_matcher.insert_rider(idle, rider1)
+    with pytest.raises(ValueError):
+        line_matcher.insert_rider(idle, rider1)
+
+def test_assign_seats_matches_dense_assign(workload_graph_matcher):
+    matcher = workload_graph_matcher
+    pairs, cost = matcher.assign_seats()
+    dense_pairs, dense_cost = matcher.assign()
+    assert len(pairs) == len(dense_pairs)
+    assert cost == pytest.approx(dense_cost)
+    riders_per_driver = {}
+    for rider, driver in pairs:
+        riders_per_driver[driver] = riders_per_driver.get(driver, 0) + 1
+    assert all(count <= driver.seats for driver, count in riders_per_driver.items())
+
+def test_assign_seats_respects_rider_limits(line_matcher):
+    driver = DriverNode({'origin': 'a', 'destination': 'b', 'available_seats': 1})
+    picky = RiderNode({'origin': 'c', 'destination': 'b', 'max_excess': 10})
+    near = RiderNode({'origin': 'a', 'destination': 'b'})
+    line_matcher.add_driver(driver)
+    line_matcher.add_rider(picky)
+    assert line_matcher.assign_seats() == ([], 0.0)
+    line_matcher.add_rider(near)
+    assert line_matcher.assign_seats() == ([(near, driver)], 0.0)
+    line_matcher.set_available_seats(driver, 0)
+    assert line_matcher.assign_seats() == ([], 0.0)
+
+def test_solve_seats_negative_costs():
+    # costs of -1 would become zero weights that SciPy drops
+    rows, cols, costs = Matcher._solve_seats(2, np.array([1, 1]), np.array([0, 1, 1]), np.array([0, 0, 1]),
+                                             np.array([-1.0, -3.0, -1.0]))
+    assert rows.tolist() == [0, 1] and cols.tolist() == [0, 1]
+    assert costs.tolist() == [-1.0, -1.0]
+
+def test_save_and_load(line_matcher, tmp_path, monkeypatch):
+    driver = DriverNode({'origin': 'a', 'destination': 'c', 'available_seats': 2,
+                         'departure_time': '2025-04-19T08:00:00'})
+    rider1 = RiderNode({'origin': 'a', 'destination': 'b', 'departure_time': '2025-04-19T08:10:00'})
+    rider2 = RiderNode({'origin': 'b', 'destination': 'c'})
+    line_matcher.departure_window = 3600
+    line_matcher.add_driver(driver)
+    line_matcher.add_rider(rider1)
+    line_matcher.add_rider(rider2)
+    line_matcher.remove_rider(rider2) # leaves a dead edge and a free node ID behind
+    line_matcher.insert_rider(driver, rider1)
+    line_matcher.save(tmp_path)
+
+    loaded = Matcher.load(tmp_path)
+    assert isinstance(loaded.distances.base, np.memmap)
+    assert loaded.departure_window == 3600
+    assert loaded.locations == ['a', 'b', 'c']
+    assert loaded.durations.tolist() == line_matcher.durations.tolist()
+    (loaded_driver,), (loaded_rider,) = list(loaded._graph), list(loaded._revgraph)
+    assert loaded_driver.data == driver.data and loaded_rider.data == rider1.data
+    assert loaded.matching == {loaded_rider: loaded_driver}
+    assert loaded.route(loaded_driver) == [(loaded_rider, True), (loaded_rider, False)]
+    assert loaded.sort_listings(loaded_rider, 1) == [(loaded_driver, line_matcher.sort_listings(rider1, 1)[0][1])]
+
+    # new locations copy the mapped matrix instead of writing to the snapshot
+    durations = {(o, d): 600 for o in 'abcd' for d in 'abcd'}
+    monkeypatch.setattr(loaded.provider, '_compute_route_matrix', fake_route_matrix(durations))
+    loaded.add_with_location(RiderNode({'origin': 'd', 'destination': 'c'}))
+    assert loaded.locations == ['a', 'b', 'c', 'd']
+    assert Matcher.load(tmp_path).locations == ['a', 'b', 'c']
+
+def test_save_over_loaded_snapshot(line_matcher, tmp_path):
+    line_matcher.save(tmp_path)
+    loaded = Matcher.load(tmp_path)
+    expected = loaded.durations.tolist()
+
+    line_matcher.locations = ['a', 'b']
+    line_matcher.distance_matrix = [[(0, 0), (500, 300)], [(500, 300), (0, 0)]]
+    line_matcher.save(tmp_path)
+    line_matcher.save(tmp_path)
+    # the mapped files of the loaded snapshot are left untouched
+    assert loaded.durations.tolist() == expected
+    assert Matcher.load(tmp_path).durations.tolist() == [[0, 300], [300, 0]]
+    # only the current snapshot and the one it replaced are kept
+    assert len([name for name in os.listdir(tmp_path) if name.startswith("snapshot-")]) == 2
+
+def test_time_slices_follow_departure_hour(monkeypatch):
+    matcher = Matcher(time_slices=2)
+    matcher.locations = ['a', 'b', 'c']
+    matcher.distance_matrix = [[(0, 0), (1000, 600), (2000, 1200)],
+                               [(1000, 600), (0, 0), (1000, 600)],
+                               [(2000, 1200), (1000, 600), (0, 0)]]
+    requested_hours = []
+
+    def compute_route_matrix(origins, destinations, routing_preference=None, departure_time=None):
+        # rush hour doubles every leg; the base matrix is requested without a departure time
+        if departure_time is not None:
+            requested_hours.append(departure_time.hour)
+        factor = 2 if departure_time is not None and departure_time.hour == 8 else 1
+        durations = {(o, d): factor * 600 * abs(ord(o) - ord(d)) for o in 'abcd' for d in 'abcd' if o != d}
+        return fake_route_matrix(durations)(origins, destinations)
+
+    monkeypatch.setattr(matcher.provider, '_compute_route_matrix', compute_route_matrix)
+    rider = RiderNode({'origin': 'b', 'destination': 'c'})
+    rush = DriverNode({'origin': 'a', 'destination': 'c', 'departure_time': '2025-04-19T08:15:00'})
+    night = DriverNode({'origin': 'b', 'destination': 'a', 'departure_time': '2025-04-19T23:00:00'})
+    untimed = DriverNode({'origin': 'b', 'destination': 'a'})
+    assert matcher.calc_cost(rider, untimed) == (40.0, 20.0)
+    assert requested_hours == []
+    assert matcher.calc_cost(rider, rush) == (20.0, 0.0) # 20 minutes from a to b
+    assert matcher.calc_cost(rider, night) == (40.0, 20.0)
+    assert sorted(set(requested_hours)) == [8, 23]
+    n_requests = len(requested_hours)
+
+    _, _, total, _ = matcher.compute_cost_matrix([rider, rider], [rush, night, untimed])
+    assert total.tolist() == [[20.0, 40.0, 40.0]] * 2
+    assert len(requested_hours) == n_requests
+
+    # a third hour evicts the least recently used slice, and new locations are filled in lazily
+    matcher.calc_cost(rider, DriverNode({'origin': 'a', 'destination': 'b', 'departure_time': '2025-04-19T12:00:00'}))
+    assert 8 not in matcher.time_slices and 23 in matcher.time_slices
+    matcher.add_locations(['d'], update=True)
+    assert matcher.calc_cost(RiderNode({'origin': 'c', 'destination': 'd'}), night) == (80.0, 40.0)
+    assert matcher.time_slices.get(23).size == 4
+
+def test_evicted_time_slices_fetch_only_needed_entries(monkeypatch):
+    matcher = Matcher(time_slices=2)
+    places = [f'p{i}' for i in range(40)]
+    matcher.locations = places
+    matcher.distance_matrix = np.zeros((40, 40, 2))
+    requests_made = []
+    durations = {(o, d): 60 for o in places for d in places}
+    monkeypatch.setattr(matcher.provider, '_compute_route_matrix', fake_route_matrix(durations, requests_made))
+    # a driver in every hour, far more hours than slices
+    drivers = [DriverNode({'origin': places[hour], 'destination': places[39 - hour],
+                           'departure_time': f'2025-04-19T{hour:02d}:00:00'}) for hour in range(24)]
+    for driver in drivers:
+        matcher.add_driver(driver)
+    for i in range(5):
+        matcher.add_rider(RiderNode({'origin': places[30 + i], 'destination': places[35 + i]}))
+    # each rider needs at most four entries per driver, far below one 40 x 40 slice
+    assert sum(len(o) * len(d) for o, d in requests_made) <= 5 * 4 * len(drivers)
+
+def test_max_detour_prunes_edges():
+    workload = generate_workload(30, 60, n_places=40, seed=2)
+    full = workload_matcher(workload)
+    pruned = workload_matcher(workload, max_detour=45)
+    for matcher in (full, pruned):
+        for i, offer in enumerate(workload['offers']):
+            matcher.add_driver(DriverNode(offer))
+            if i % 2:
+                matcher.add_rider(RiderNode(workload['requests'][i]))
+        for request in workload['requests'][len(workload['offers']):]:
+            matcher.add_rider(RiderNode(request))
+
+    def edges(matcher):
+        return {(rider.data['id'], driver.data['id']): cost for driver in matcher._graph
+                for rider, cost in matcher._graph[driver]}
+    expected = {pair: cost for pair, cost in edges(full).items() if cost[1] <= 45}
+    assert 0 < len(expected) < len(edges(full))
+    assert edges(pruned) == expected
+
+def test_assign_approx_close_to_exact(workload_graph_matcher):
+    matcher = workload_graph_matcher
+    exact_pairs, exact_cost = matcher.assign_seats()
+
+    pairs, cost = matcher.assign_approx('auction', epsilon=0.01)
+    riders_per_driver = {}
+    for rider, driver in pairs:
+        riders_per_driver[driver] = riders_per_driver.get(driver, 0) + 1
+    assert all(count <= driver.seats for driver, count in riders_per_driver.items())
+    assert len({rider for rider, _ in pairs}) == len(pairs)
+    assert len(pairs) == len(exact_pairs)
+    assert exact_cost <= cost <= exact_cost + 0.01 * len(matcher.graph.riders)
+
+    greedy_pairs, _ = matcher.assign_approx('greedy')
+    assert 0 < len(greedy_pairs) <= len(exact_pairs)
+    gap = matcher.approximation_gap('auction', epsilon=0.01, sample_drivers=8)
+    assert gap['riders'] > 0 and 0 <= gap['gap'] <= 0.01 * gap['riders'] / gap['exact_cost']
+    with pytest.raises(ValueError):
+        matcher.assign_approx('simplex')
@@ -0,0 +1,66 @@
+import pytest
+import numpy as np
+from match import Matcher, DriverNode, RiderNode, UNKNOWN
+from providers import RoadGraphProvider
+
+ROAD_GRAPH = """
+# from to distance_m duration_s
+a b 1000 60
+b c 1000 60
+a c 1500 300
+c d 500 30 oneway
+a b 900 90
+e f 100 10
+"""
+
+@pytest.fixture
+def provider(tmp_path):
+    path = tmp_path / "roads.txt"
+    path.write_text(ROAD_GRAPH)
+    return RoadGraphProvider.load(str(path), places={'place:A': 'a'})
+
+def test_fastest_routes(provider):
+    distances, durations = provider.route_matrix(['place:A', 'c', 'd'], ['a', 'c', 'd', 'e', 'nowhere'])
+    # a -> c goes through b, which is faster but longer than the direct road
+    assert durations.tolist() == [
+        [0, 120, 150, UNKNOWN, UNKNOWN],
+        [120, 0, 30, UNKNOWN, UNKNOWN],
+        [UNKNOWN, UNKNOWN, 0, UNKNOWN, UNKNOWN],
+    ]
+    assert distances[0].tolist() == [0, 2000, 2500, UNKNOWN, UNKNOWN]
+
+def test_matcher_with_local_provider(provider):
+    matcher = Matcher(provider=provider)
+    driver = DriverNode({'origin': 'place:A', 'destination': 'c'})
+    rider = RiderNode({'origin': 'b', 'destination': 'c'})
+    matcher.add_with_location(driver)
+    matcher.add_with_location(rider)
+    assert matcher.sort_listings(rider, 1) == [(driver, (1.0, 0.0))]
+    assert matcher.matching == {rider: driver}
+
+def test_google_chunks_run_in_parallel(monkeypatch):
+    import threading
+    import time
+    from providers import GoogleRoutesProvider
+    from test_match import fake_route_matrix
+    places = [f'p{i}' for i in range(60)]
+    answer = fake_route_matrix({(o, d): 60 for o in places for d in places})
+    lock = threading.Lock()
+    in_flight, peak = [0], [0]
+
+    def compute_route_matrix(origins, destinations, routing_preference=None, departure_time=None):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+        return answer(origins, destinations)
+
+    provider = GoogleRoutesProvider(api_key='test', max_concurrency=3)
+    monkeypatch.setattr(provider, '_compute_route_matrix', compute_route_matrix)
+    distances, durations = provider.route_matrix(places, places)
+    provider.close()
+    assert peak[0] == 3
+    assert (durations == 60 * (1 - np.eye(60))).all()
+    assert (distances == 600 * (1 - np.eye(60))).all()
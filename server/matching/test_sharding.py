@@ -0,0 +1,51 @@
+import pytest
+from match import DriverNode, RiderNode
+from providers import GoogleRoutesProvider
+from sharding import ShardedMatcher
+from test_match import fake_route_matrix
+
+PLACES = ['or:corvallis', 'or:portland', 'wa:seattle', 'ny:nyc', 'ny:albany']
+DURATIONS = {(o, d): 600 * (1 + abs(PLACES.index(o) - PLACES.index(d))) for o in PLACES for d in PLACES}
+
+class FakeRoutesProvider(GoogleRoutesProvider):
+    def _compute_route_matrix(self, origins, destinations, routing_preference=None, departure_time=None):
+        return fake_route_matrix(DURATIONS)(origins, destinations)
+
+@pytest.fixture
+def sharded():
+    with ShardedMatcher(lambda place: place.split(':')[0], n_workers=2, provider=FakeRoutesProvider()) as matcher:
+        yield matcher
+
+def test_nodes_only_meet_within_their_regions(sharded):
+    oregon = DriverNode({'origin': 'or:corvallis', 'destination': 'or:portland'})
+    new_york = DriverNode({'origin': 'ny:nyc', 'destination': 'ny:albany'})
+    crossing = DriverNode({'origin': 'or:portland', 'destination': 'wa:seattle'})
+    rider = RiderNode({'origin': 'or:corvallis', 'destination': 'or:portland'})
+    for node in (oregon, new_york, crossing, rider):
+        sharded.add_with_location(node)
+
+    listings = sharded.sort_listings(rider, 5)
+    assert [driver for driver, _ in listings] == [oregon, crossing]
+    assert listings[0][1] == (0.0, 0.0)
+    assert sharded.sort_listings(new_york, 5) == []
+    assert sharded.shard_sizes() == {'or': 3, 'ny': 2, 'wa': 2}
+
+    sharded.remove_driver(oregon)
+    assert [driver for driver, _ in sharded.sort_listings(rider, 5)] == [crossing]
+
+def test_expire_departed(sharded):
+    early = DriverNode({'origin': 'or:portland', 'destination': 'wa:seattle', 'departure_time': '2025-04-19T08:00:00'})
+    late = DriverNode({'origin': 'or:corvallis', 'destination': 'or:portland', 'departure_time': '2025-04-19T10:00:00'})
+    rider = RiderNode({'origin': 'or:corvallis', 'destination': 'or:portland'})
+    for node in (early, late, rider):
+        sharded.add_with_location(node)
+    assert sharded.expire_departed(late.departure - 60) == [early]
+    assert [driver for driver, _ in sharded.sort_listings(rider, 5)] == [late]
+
+def test_worker_errors_are_raised(sharded):
+    rider = RiderNode({'origin': 'or:corvallis', 'destination': 'or:portland'})
+    sharded.add_with_location(rider)
+    sharded._send(sharded._worker_of['or'], 'remove', 'or', 12345)
+    with pytest.raises(KeyError):
+        sharded.sort_listings(rider, 1)
+    assert sharded.sort_listings(rider, 1) == []
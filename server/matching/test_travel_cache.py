@@ -0,0 +1,31 @@
+import pytest
+from travel_cache import TravelTimeCache, ANY_DEPARTURE
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = TravelTimeCache(str(tmp_path / "cache.sqlite3"))
+    yield cache
+    cache.close()
+
+def test_put_and_get(cache):
+    cache.put_many([('a', 'b', 1000, 600), ('a', 'c', -1, -1), ('b', 'a', 900, 500)], bucket=8)
+    assert cache.get_many(['a'], ['b', 'c'], bucket=8) == {('a', 'b'): (1000, 600), ('a', 'c'): (-1, -1)}
+    assert cache.get_many(['a'], ['b'], bucket=9) == {}
+
+def test_routing_preference_is_part_of_key(cache):
+    cache.put_many([('a', 'b', 1000, 600)], bucket=ANY_DEPARTURE)
+    cache.put_many([('a', 'b', 1000, 900)], bucket=ANY_DEPARTURE, routing_preference="TRAFFIC_AWARE")
+    assert cache.get_many(['a'], ['b'], bucket=ANY_DEPARTURE) == {('a', 'b'): (1000, 600)}
+    assert cache.get_many(['a'], ['b'], ANY_DEPARTURE, "TRAFFIC_AWARE") == {('a', 'b'): (1000, 900)}
+
+def test_persists_across_instances(cache):
+    cache.put_many([('a', 'b', 1000, 600)], bucket=8)
+    reopened = TravelTimeCache(cache.path)
+    assert reopened.get_many(['a'], ['b'], bucket=8) == {('a', 'b'): (1000, 600)}
+    reopened.close()
+
+def test_ttl(cache):
+    cache.put_many([('a', 'b', 1000, 600)], bucket=8)
+    cache.ttl = -1
+    assert cache.get_many(['a'], ['b'], bucket=8) == {}
+    assert cache.purge() == 1
@@ -0,0 +1,50 @@
+import pytest
+import numpy as np
+from travel_matrix import TravelMatrix, UNKNOWN
+
+@pytest.fixture
+def matrix():
+    return TravelMatrix()
+
+def test_append_grows_capacity_geometrically(matrix):
+    capacities = set()
+    for n in range(100):
+        row = np.arange(n + 1, dtype=np.int32)
+        matrix.append(row[None, :], row[None, :])
+        capacities.add(matrix.capacity)
+    assert matrix.size == 100
+    assert sorted(capacities) == [8, 16, 32, 64, 128]
+    # the mirrored column holds the row values
+    assert matrix.durations[99, 5] == matrix.durations[5, 99] == 5
+    assert matrix.durations[99, 99] == 99
+
+def test_append_with_columns(matrix):
+    matrix.set([[0, 1], [2, 0]], [[0, 10], [20, 0]])
+    matrix.append([[3, 4, 0]], [[30, 40, 0]], col_distances=[[5], [6]], col_durations=[[50], [60]])
+    assert matrix.durations.tolist() == [[0, 10, 50], [20, 0, 60], [30, 40, 0]]
+
+def test_views_stay_consistent(matrix):
+    matrix.set([[0, 1], [1, 0]], [[0, 1], [1, 0]])
+    distances, durations = matrix.view()
+    matrix.append([[7, 7, 0]], [[7, 7, 0]])
+    assert durations.shape == (2, 2)
+    assert durations.tolist() == [[0, 1], [1, 0]]
+
+def test_resize_fills_unknown(matrix):
+    matrix.resize(3)
+    assert matrix.durations.tolist() == [[0, UNKNOWN, UNKNOWN], [UNKNOWN, 0, UNKNOWN], [UNKNOWN, UNKNOWN, 0]]
+
+def test_take_keeps_selected_locations(matrix):
+    matrix.set(np.arange(9).reshape(3, 3), np.arange(9).reshape(3, 3) * 10)
+    matrix.take([2, 0])
+    assert matrix.size == 2
+    assert matrix.durations.tolist() == [[80, 60], [20, 0]]
+
+def test_from_buffers_copies_on_growth():
+    distances = np.zeros((2, 2), dtype=np.int32)
+    distances.flags.writeable = False
+    matrix = TravelMatrix.from_buffers(distances, distances)
+    assert matrix.size == 2 and matrix.distances.base is distances
+    matrix.append([[5, 6, 0]], [[5, 6, 0]])
+    assert matrix.durations.tolist() == [[0, 0, 5], [0, 0, 6], [5, 6, 0]]
+    assert distances.tolist() == [[0, 0], [0, 0]]
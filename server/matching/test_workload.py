@@ -0,0 +1,31 @@
+import numpy as np
+from benchmark import run_benchmark, workload_matcher
+from match import DriverNode, RiderNode
+from workload import generate_workload
+
+def test_workload_is_reproducible():
+    first = generate_workload(50, 80, n_places=30, seed=3)
+    second = generate_workload(50, 80, n_places=30, seed=3)
+    assert first['offers'] == second['offers']
+    assert first['requests'] == second['requests']
+    assert len(first['offers']) == 50 and len(first['requests']) == 80
+    assert first['durations'].shape == (30, 30)
+    assert (np.diag(first['durations']) == 0).all()
+    assert all(ride['origin'] != ride['destination'] for ride in first['offers'] + first['requests'])
+
+def test_workload_matcher_costs_every_pair():
+    workload = generate_workload(5, 5, n_places=20)
+    matcher = workload_matcher(workload)
+    for offer in workload['offers']:
+        matcher.add_driver(DriverNode(offer))
+    for request in workload['requests']:
+        matcher.add_rider(RiderNode(request))
+    _, _, total, _ = matcher.compute_cost_matrix()
+    assert np.isfinite(total).all()
+
+def test_benchmark_reports_every_stage():
+    results = run_benchmark(20, 20, n_cost_pairs=100, trace_memory=True, n_places=20)
+    for stage in ('add_driver', 'add_rider', 'calc_cost', 'sort_listings', 'assign_seats', 'assign'):
+        assert results[stage]['ops'] > 0
+        assert results[stage]['peak_mib'] >= 0
+    assert results['edges'] > 0
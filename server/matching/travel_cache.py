@@ -0,0 +1,104 @@
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "travel_cache.sqlite3")
+DEFAULT_TTL = 7 * 24 * 60 * 60 # seconds a cached route stays valid
+ANY_DEPARTURE = -1 # bucket of routes fetched without a departure time
+
+class TravelTimeCache:
+    """
+    Persistent SQLite cache of route matrix results, keyed by
+    (origin place_id, destination place_id, departure-hour bucket, routing
+    preference), so a restarted Matcher only pays the Routes API for pairs it
+    has not seen within the TTL. Routes fetched without a departure time go
+    in the ANY_DEPARTURE bucket.
+    """
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=DEFAULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS travel_times (
+                origin TEXT NOT NULL,
+                destination TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                routing_preference TEXT NOT NULL,
+                distance INTEGER NOT NULL,
+                duration INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                PRIMARY KEY (origin, destination, bucket, routing_preference)
+            )
+        """)
+        self._conn.commit()
+
+    def get_many(self, origins, destinations, bucket, routing_preference=None):
+        """
+        Looks up every origin -> destination pair for a departure-hour bucket
+        and routing preference.
+
+        Args:
+            origins (list): Origin place IDs.
+            destinations (list): Destination place IDs.
+            bucket (int): Departure-hour bucket, or ANY_DEPARTURE.
+            routing_preference (str, optional): Routing preference the routes
+                were fetched with, None for the provider default.
+
+        Returns:
+            dict: (origin, destination) -> (distance, duration) for the pairs
+                cached within the TTL. Missing pairs are left out.
+        """
+        destinations = set(destinations)
+        oldest = time.time() - self.ttl
+        found = {}
+        origins = list(dict.fromkeys(origins))
+        with self._lock:
+            # stay well under SQLite's bound parameter limit
+            for start in range(0, len(origins), 500):
+                chunk = origins[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT origin, destination, distance, duration FROM travel_times "
+                    f"WHERE bucket = ? AND routing_preference = ? AND fetched_at >= ? "
+                    f"AND origin IN ({','.join('?' * len(chunk))})",
+                    [bucket, routing_preference or '', oldest, *chunk])
+                for origin, destination, distance, duration in rows:
+                    if destination in destinations:
+                        found[origin, destination] = (distance, duration)
+        return found
+
+    def put_many(self, entries, bucket, routing_preference=None):
+        """
+        Stores route results for a departure-hour bucket and routing
+        preference, replacing older ones.
+
+        Args:
+            entries (list): (origin, destination, distance, duration) tuples.
+            bucket (int): Departure-hour bucket, or ANY_DEPARTURE.
+            routing_preference (str, optional): Routing preference the routes
+                were fetched with, None for the provider default.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO travel_times VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(origin, destination, bucket, routing_preference or '', int(distance), int(duration), now)
+                 for origin, destination, distance, duration in entries])
+            self._conn.commit()
+
+    def purge(self):
+        """
+        Deletes entries older than the TTL.
+
+        Returns:
+            int: The number of entries deleted.
+        """
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM travel_times WHERE fetched_at < ?", (time.time() - self.ttl,))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,219 @@
+import numpy as np
+import threading
+from collections import OrderedDict
+
+UNKNOWN = -1 # sentinel for a distance/duration that has not been fetched (or has no route)
+NOT_FETCHED = -2 # sentinel for a time-slice entry that has not been requested yet
+
+class TravelMatrix:
+    """
+    Square distance (meters) and duration (seconds) matrices between
+    locations, indexed as [origin][destination], stored in preallocated int32
+    buffers that double in capacity when full. Adding n locations one at a
+    time therefore copies O(n^2) cells in total instead of O(n^3).
+
+    Readers always see a consistent view: new rows and columns are written
+    past the logical size, and the (buffers, size) state is only published
+    once they are complete. Writers are serialized with a lock.
+    """
+    MIN_CAPACITY = 8
+
+    def __init__(self, size=0, fill=UNKNOWN):
+        self._lock = threading.Lock()
+        self._fill = fill # value of entries that have not been written
+        self._state = self._allocate(size, size) # (distances buffer, durations buffer, logical size)
+
+    def _allocate(self, capacity, size):
+        capacity = max(capacity, TravelMatrix.MIN_CAPACITY)
+        distances = np.full((capacity, capacity), self._fill, dtype=np.int32)
+        durations = np.full((capacity, capacity), self._fill, dtype=np.int32)
+        np.fill_diagonal(distances, 0)
+        np.fill_diagonal(durations, 0)
+        return distances, durations, size
+
+    @classmethod
+    def from_buffers(cls, distances, durations):
+        """
+        Wraps existing (n, n) int32 arrays without copying them, e.g. read-only 
+        memory-mapped files shared by several processes. They are only read; 
+        the first append or resize copies them into private buffers.
+        """
+        matrix = cls.__new__(cls)
+        matrix._lock = threading.Lock()
+        matrix._fill = UNKNOWN
+        matrix._state = (distances, durations, distances.shape[0])
+        return matrix
+
+    @property
+    def size(self):
+        return self._state[2]
+
+    @property
+    def capacity(self):
+        return self._state[0].shape[0]
+
+    def view(self):
+        """
+        Returns:
+            tuple: (distances, durations) views of the current logical
+                matrices, taken from the same published state.
+        """
+        distances, durations, size = self._state
+        return distances[:size, :size], durations[:size, :size]
+
+    @property
+    def distances(self):
+        distances, _, size = self._state
+        return distances[:size, :size]
+
+    @property
+    def durations(self):
+        _, durations, size = self._state
+        return durations[:size, :size]
+
+    def _reserve(self, capacity):
+        """
+        Makes room for `capacity` locations, at least doubling the buffers when
+        they have to grow. Must be called with the lock held.
+
+        Returns:
+            tuple: The (distances, durations) buffers to write into.
+        """
+        distances, durations, size = self._state
+        if capacity <= distances.shape[0]:
+            return distances, durations
+        new_distances, new_durations, _ = self._allocate(max(capacity, 2 * distances.shape[0]), size)
+        new_distances[:size, :size] = distances[:size, :size]
+        new_durations[:size, :size] = durations[:size, :size]
+        return new_distances, new_durations
+
+    def set(self, distances, durations):
+        """
+        Replaces the matrices with copies of full (n, n) arrays.
+        """
+        distances = np.asarray(distances, dtype=np.int32)
+        durations = np.asarray(durations, dtype=np.int32)
+        size = distances.shape[0]
+        with self._lock:
+            new_distances, new_durations, _ = self._allocate(size, size)
+            new_distances[:size, :size] = distances
+            new_durations[:size, :size] = durations
+            self._state = (new_distances, new_durations, size)
+
+    def resize(self, size):
+        """
+        Grows the logical size to `size`, leaving the new entries unwritten: 
+        UNKNOWN, or the matrix's `fill`.
+        """
+        with self._lock:
+            if size <= self.size:
+                return
+            distances, durations = self._reserve(size)
+            self._state = (distances, durations, size)
+
+    def append(self, row_distances, row_durations, col_distances=None, col_durations=None):
+        """
+        Appends k new locations in amortized O(n) time per location.
+
+        Args:
+            row_distances (array-like): (k, n + k) distances from each new
+                location to every location, the new ones included.
+            row_durations (array-like): (k, n + k) durations, likewise.
+            col_distances (array-like, optional): (n, k) distances from every
+                existing location to each new one. Defaults to mirroring the
+                rows, i.e. treating the matrix as symmetric.
+            col_durations (array-like, optional): (n, k) durations, likewise.
+        """
+        row_distances = np.asarray(row_distances, dtype=np.int32)
+        row_durations = np.asarray(row_durations, dtype=np.int32)
+        with self._lock:
+            n = self.size
+            k = row_distances.shape[0]
+            if col_distances is None:
+                col_distances = row_distances[:, :n].T
+            if col_durations is None:
+                col_durations = row_durations[:, :n].T
+
+            distances, durations = self._reserve(n + k)
+            distances[n:n + k, :n + k] = row_distances
+            durations[n:n + k, :n + k] = row_durations
+            distances[:n, n:n + k] = col_distances
+            durations[:n, n:n + k] = col_durations
+            self._state = (distances, durations, n + k)
+
+    def update(self, origins, destinations, distances, durations, mask):
+        """
+        Writes entries between existing locations in place.
+
+        Args:
+            origins (numpy.ndarray): Row indices.
+            destinations (numpy.ndarray): Column indices.
+            distances (numpy.ndarray): (len(origins), len(destinations)) distances.
+            durations (numpy.ndarray): Durations, likewise.
+            mask (numpy.ndarray): Which of the entries to write.
+        """
+        rows, cols = np.nonzero(mask)
+        with self._lock:
+            buffer_distances, buffer_durations, _ = self._state
+            buffer_distances[origins[rows], destinations[cols]] = distances[rows, cols]
+            buffer_durations[origins[rows], destinations[cols]] = durations[rows, cols]
+
+    def take(self, indices):
+        """
+        Keeps only the locations at `indices`, in that order, renumbering them 
+        0..len(indices) - 1. Used to drop locations that are no longer needed.
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        k = len(indices)
+        with self._lock:
+            distances, durations, _ = self._state
+            new_distances, new_durations, _ = self._allocate(k, k)
+            rows, cols = np.ix_(indices, indices)
+            new_distances[:k, :k] = distances[rows, cols]
+            new_durations[:k, :k] = durations[rows, cols]
+            self._state = (new_distances, new_durations, k)
+
+class TimeSlicedMatrix:
+    """
+    Travel matrices by departure-hour bucket, a (bucket x n x n) tensor kept 
+    sparse: only buckets that have been queried hold a `TravelMatrix`, and 
+    past `max_slices` the least recently used one is evicted. Within a slice, 
+    entries start out NOT_FETCHED and its owner fetches only the ones it 
+    reads; a slice may also cover fewer locations than the owner knows.
+    """
+    def __init__(self, max_slices=4):
+        self.max_slices = max_slices
+        self._slices = OrderedDict() # bucket -> TravelMatrix, least recently used first
+
+    def __len__(self):
+        return len(self._slices)
+
+    def __contains__(self, bucket):
+        return bucket in self._slices
+
+    def get(self, bucket):
+        """
+        Returns the bucket's matrix and marks it most recently used, or None 
+        if it is not loaded.
+        """
+        matrix = self._slices.get(bucket)
+        if matrix is not None:
+            self._slices.move_to_end(bucket)
+        return matrix
+
+    def put(self, bucket, matrix):
+        self._slices[bucket] = matrix
+        self._slices.move_to_end(bucket)
+        while len(self._slices) > self.max_slices:
+            self._slices.popitem(last=False)
+
+    def take(self, indices):
+        """
+        Keeps only the locations at the sorted `indices` in every slice, as 
+        `TravelMatrix.take` does.
+        """
+        for matrix in self._slices.values():
+            matrix.take([i for i in indices if i < matrix.size])
+
+    def clear(self):
+        self._slices.clear()
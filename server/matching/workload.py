@@ -0,0 +1,137 @@
+import numpy as np
+from datetime import datetime, timedelta
+
+EARTH_RADIUS_M = 6371000
+DEPARTURE_PEAKS = [(8.0, 1.0, 0.4), (17.5, 1.5, 0.4)] # (hour, std dev in hours, share) of the commute peaks, the rest is uniform
+
+def generate_places(n_places, n_cities=10, seed=0, center=(44.5, -123.0), spread_km=300, city_km=15):
+    """
+    Scatters synthetic places around a few cities, so most trips stay in a
+    metro area and the rest run between cities.
+
+    Args:
+        n_places (int): Number of places.
+        n_cities (int, optional): Number of cities the places cluster around.
+        seed (int, optional): Random seed.
+        center (tuple, optional): (lat, lng) the cities are scattered around.
+        spread_km (float, optional): Standard deviation of city positions.
+        city_km (float, optional): Standard deviation of places around their city.
+
+    Returns:
+        tuple: (place IDs, (n_places, 2) array of (lat, lng) in degrees,
+            city index of each place).
+    """
+    rng = np.random.default_rng(seed)
+    km_per_degree = 111.0
+    cities = np.array(center) + rng.normal(0, spread_km / km_per_degree, size=(n_cities, 2))
+    city_of = rng.integers(n_cities, size=n_places)
+    coords = cities[city_of] + rng.normal(0, city_km / km_per_degree, size=(n_places, 2))
+    place_ids = [f"synthetic:{i}" for i in range(n_places)]
+    return place_ids, coords, city_of
+
+def synthetic_matrix(coords, detour=1.3, speed_kmh=70):
+    """
+    Builds distance and duration matrices from great-circle distances,
+    stretched by a road detour factor and driven at a constant speed.
+
+    Returns:
+        tuple: (distances, durations) (n, n) int32 arrays in meters and
+            seconds, [origin][destination].
+    """
+    lat, lng = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat[:, None]) * np.cos(lat[None, :]) * np.sin(dlng / 2) ** 2
+    distances = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1))) * detour
+    durations = distances / (speed_kmh / 3.6)
+    return distances.astype(np.int32), durations.astype(np.int32)
+
+def _departure_times(rng, n, start, days):
+    """Samples departure times with morning and evening peaks over `days` days."""
+    hours = rng.uniform(6, 22, size=n)
+    kind = rng.uniform(size=n)
+    low = 0.0
+    for hour, std, share in DEPARTURE_PEAKS:
+        peak = (kind >= low) & (kind < low + share)
+        hours[peak] = np.clip(rng.normal(hour, std, size=peak.sum()), 0, 23.99)
+        low += share
+    offsets = rng.integers(days, size=n) * 86400 + (hours * 3600).astype(int)
+    return [(start + timedelta(seconds=int(s))).isoformat() for s in offsets]
+
+def _trips(rng, n, city_of, corridors, weights, local_share):
+    """
+    Samples (origin, destination) place indices: a share of trips stay within
+    one city, the rest follow intercity corridors picked by popularity.
+    """
+    by_city = np.argsort(city_of, kind='stable') # place indices grouped by city
+    counts = np.bincount(city_of)
+    starts = np.cumsum(counts) - counts
+
+    def place_in(cities):
+        return by_city[starts[cities] + (rng.uniform(size=len(cities)) * counts[cities]).astype(np.intp)]
+
+    chosen = corridors[rng.choice(len(corridors), size=n, p=weights)]
+    # a trip can only stay within a city that has more than one place
+    local = (rng.uniform(size=n) < local_share) & (counts[chosen[:, 0]] > 1)
+    src_city = chosen[:, 0]
+    dest_city = np.where(local, chosen[:, 0], chosen[:, 1])
+    trips = np.stack((place_in(src_city), place_in(dest_city)), axis=1)
+    # resample destinations that landed on the origin, where the city has other places
+    same = np.flatnonzero((trips[:, 0] == trips[:, 1]) & (counts[dest_city] > 1))
+    while same.size:
+        trips[same, 1] = place_in(dest_city[same])
+        same = same[trips[same, 0] == trips[same, 1]]
+    return trips
+
+def generate_workload(n_offers, n_requests, n_places=200, n_cities=10, n_corridors=20, local_share=0.3,
+                      start=datetime(2025, 4, 19), days=1, seed=0):
+    """
+    Generates ride offers and requests shaped like `sample_data.py` over a
+    synthetic set of places, with commute-peaked departure times and trips
+    concentrated on a few popular intercity corridors (Zipf-weighted).
+
+    Args:
+        n_offers (int): Number of ride offers.
+        n_requests (int): Number of ride requests.
+        n_places (int, optional): Number of places.
+        n_cities (int, optional): Number of cities the places cluster around.
+        n_corridors (int, optional): Number of distinct intercity corridors.
+        local_share (float, optional): Share of trips within one city.
+        start (datetime, optional): Midnight of the first day of departures.
+        days (int, optional): Number of days departures are spread over.
+        seed (int, optional): Random seed.
+
+    Returns:
+        dict: 'places' (place IDs, in matrix order), 'distances' and
+            'durations' (int32 matrices), 'offers' and 'requests' (lists of
+            ride offer/request dicts).
+    """
+    rng = np.random.default_rng(seed)
+    places, coords, city_of = generate_places(n_places, n_cities, seed)
+    distances, durations = synthetic_matrix(coords)
+
+    present = np.unique(city_of)
+    pairs = np.array([(a, b) for a in present for b in present if a != b] or [(present[0], present[0])])
+    corridors = pairs[rng.permutation(len(pairs))[:n_corridors]]
+    weights = 1.0 / np.arange(1, len(corridors) + 1)
+    weights /= weights.sum()
+
+    def rides(n, id_key, id_base):
+        trips = _trips(rng, n, city_of, corridors, weights, local_share)
+        departures = _departure_times(rng, n, start, days)
+        seats = rng.integers(1, 5, size=n)
+        return [{
+            "id": i + 1,
+            id_key: id_base + i + 1,
+            "origin": places[trips[i, 0]],
+            "destination": places[trips[i, 1]],
+            "departure_time": departures[i],
+            "available_seats": int(seats[i]),
+        } for i in range(n)]
+
+    offers = rides(n_offers, "driver_id", 100000)
+    requests = rides(n_requests, "rider_id", 200000)
+    for request in requests:
+        del request["available_seats"]
+    return {'places': places, 'distances': distances, 'durations': durations,
+            'offers': offers, 'requests': requests}
@@ -0,0 +1,276 @@
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EARTH_RADIUS_M = 6371000
+DETOUR = 1.3 # road distance per great-circle distance
+SPEED_MPS = 70 / 3.6
+BOUNDS = ((42.0, 46.2), (-124.5, -116.5)) # (lat, lng) ranges fake places are scattered over, roughly Oregon
+
+OPTIMIZE_TOURS = re.compile(r"^/v1/projects/[^/:]+:optimizeTours$")
+PLACE_DETAILS = re.compile(r"^/v1/places/([^/:]+)$")
+
+class _NotFound(Exception):
+    pass
+
+def place_coordinates(place):
+    """
+    Returns stable fake (lat, lng) coordinates for any place ID or text query.
+    """
+    digest = hashlib.sha256(str(place).encode()).digest()
+    (lat_lo, lat_hi), (lng_lo, lng_hi) = BOUNDS
+    lat = lat_lo + (lat_hi - lat_lo) * int.from_bytes(digest[:4], 'big') / 2**32
+    lng = lng_lo + (lng_hi - lng_lo) * int.from_bytes(digest[4:8], 'big') / 2**32
+    return lat, lng
+
+def travel(origin, destination):
+    """
+    Returns the fake (distance in meters, duration in seconds) between two places.
+    """
+    if origin == destination:
+        return 0, 0
+    (lat1, lng1), (lat2, lng2) = place_coordinates(origin), place_coordinates(destination)
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    distance = 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1))) * DETOUR
+    return int(distance), int(distance / SPEED_MPS)
+
+def encode_polyline(points):
+    """
+    Encodes (lat, lng) points with Google's encoded polyline algorithm.
+    """
+    result = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        lat, lng = round(lat * 1e5), round(lng * 1e5)
+        for delta in (lat - prev_lat, lng - prev_lng):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                result.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            result.append(chr(value + 63))
+        prev_lat, prev_lng = lat, lng
+    return "".join(result)
+
+def _place(waypoint):
+    """Returns the place ID of a waypoint object, or its lat/lng as a string."""
+    waypoint = waypoint.get('waypoint', waypoint)
+    return waypoint.get('placeId') or json.dumps(waypoint.get('location', waypoint), sort_keys=True)
+
+def compute_route_matrix(body):
+    elements = []
+    for i, origin in enumerate(body.get('origins', [])):
+        for j, destination in enumerate(body.get('destinations', [])):
+            distance, duration = travel(_place(origin), _place(destination))
+            elements.append({
+                "originIndex": i,
+                "destinationIndex": j,
+                "status": {},
+                "condition": "ROUTE_EXISTS",
+                "distanceMeters": distance,
+                "duration": f"{duration}s",
+                "staticDuration": f"{duration}s",
+            })
+    return elements
+
+def compute_routes(body):
+    origin, destination = _place(body['origin']), _place(body['destination'])
+    distance, duration = travel(origin, destination)
+    polyline = encode_polyline([place_coordinates(origin), place_coordinates(destination)])
+    return {"routes": [{
+        "distanceMeters": distance,
+        "duration": f"{duration}s",
+        "polyline": {"encodedPolyline": polyline},
+    }]}
+
+def optimize_tours(body):
+    """
+    Visits the vehicle's start, every shipment's pickup then delivery in
+    request order, and the vehicle's end; no actual optimization is done.
+    """
+    model = body.get('model', {})
+    vehicle = model.get('vehicles', [{}])[0]
+    stops = [_place(vehicle['startWaypoint'])] if 'startWaypoint' in vehicle else []
+    visits = []
+    for index, shipment in enumerate(model.get('shipments', [])):
+        for kind, is_pickup in (('pickups', True), ('deliveries', False)):
+            stops.append(_place(shipment[kind][0]['arrivalWaypoint']))
+            visits.append({"shipmentIndex": index, "isPickup": is_pickup})
+    if 'endWaypoint' in vehicle:
+        stops.append(_place(vehicle['endWaypoint']))
+
+    legs = [travel(a, b) for a, b in zip(stops, stops[1:])]
+    distance, duration = sum(leg[0] for leg in legs), sum(leg[1] for leg in legs)
+    metrics = {"totalDuration": f"{duration}s", "travelDuration": f"{duration}s", "travelDistanceMeters": distance}
+    return {
+        "routes": [{
+            "visits": visits,
+            "transitions": [{"travelDuration": f"{leg[1]}s", "travelDistanceMeters": leg[0]} for leg in legs],
+            "routePolyline": {"points": encode_polyline([place_coordinates(stop) for stop in stops])},
+            "metrics": metrics,
+        }],
+        "metrics": {"aggregatedRouteMetrics": metrics, "usedVehicleCount": 1},
+    }
+
+def search_text(body):
+    query = body.get('textQuery', '')
+    place_id = "mock_" + hashlib.sha256(query.encode()).hexdigest()[:24]
+    lat, lng = place_coordinates(place_id)
+    return {"places": [{
+        "id": place_id,
+        "formattedAddress": query,
+        "displayName": {"text": query, "languageCode": "en"},
+        "location": {"latitude": lat, "longitude": lng},
+    }]}
+
+def place_details(place_id):
+    lat, lng = place_coordinates(place_id)
+    return {"id": place_id, "formattedAddress": f"Mock address {place_id}",
+            "location": {"latitude": lat, "longitude": lng}}
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "MockGoogle/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method):
+        server = self.server
+        path = self.path.split('?')[0]
+        with server.lock:
+            server.request_counts[path] = server.request_counts.get(path, 0) + 1
+            fail = server.random.random() < server.error_rate
+            delay = max(0.0, server.random.gauss(server.latency, server.latency_jitter)) if server.latency else 0.0
+        if delay:
+            time.sleep(delay)
+        if fail:
+            self._reply(503, {"error": {"code": 503, "message": "The service is currently unavailable.",
+                                        "status": "UNAVAILABLE"}})
+            return
+
+        try:
+            if method == 'GET':
+                match = PLACE_DETAILS.match(path)
+                if not match:
+                    raise _NotFound(path)
+                self._reply(200, place_details(match.group(1)))
+                return
+            length = int(self.headers.get('Content-Length', 0))
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if path == "/distanceMatrix/v2:computeRouteMatrix":
+                self._reply(200, compute_route_matrix(body))
+            elif path == "/directions/v2:computeRoutes":
+                self._reply(200, compute_routes(body))
+            elif path == "/v1/places:searchText":
+                self._reply(200, search_text(body))
+            elif OPTIMIZE_TOURS.match(path):
+                self._reply(200, optimize_tours(body))
+            else:
+                raise _NotFound(path)
+        except _NotFound:
+            self._reply(404, {"error": {"code": 404, "message": f"Unknown path {path}", "status": "NOT_FOUND"}})
+        except (KeyError, IndexError, ValueError) as e:
+            self._reply(400, {"error": {"code": 400, "message": f"Invalid request: {e!r}",
+                                        "status": "INVALID_ARGUMENT"}})
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+class MockGoogleServer:
+    """
+    Local stand-in for the Google APIs the server calls: Routes
+    (computeRouteMatrix, computeRoutes), Route Optimization (optimizeTours)
+    and Places (places:searchText, place details). Responses have the real
+    shapes, with travel times derived from stable fake coordinates of each
+    place, so the stack can be load tested without keys or quota.
+
+    Point the clients at it with the base URL environment variables
+    GOOGLE_ROUTES_BASE_URL, GOOGLE_ROUTE_OPTIMIZATION_BASE_URL and
+    GOOGLE_PLACES_BASE_URL, all set to `url`.
+    """
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, latency_jitter=0.0, error_rate=0.0, seed=None,
+                 verbose=False):
+        """
+        Args:
+            host (str, optional): Interface to listen on.
+            port (int, optional): Port to listen on, 0 for any free port.
+            latency (float, optional): Mean seconds added to every response.
+            latency_jitter (float, optional): Standard deviation of the added latency.
+            error_rate (float, optional): Share of requests answered with 503 UNAVAILABLE.
+            seed (int, optional): Seed of the latency and error draws.
+            verbose (bool, optional): If True, logs every request.
+        """
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.latency_jitter = latency_jitter
+        self.httpd.error_rate = error_rate
+        self.httpd.random = random.Random(seed)
+        self.httpd.lock = threading.Lock()
+        self.httpd.request_counts = {} # path -> number of requests
+        self.httpd.verbose = verbose
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_counts(self):
+        return dict(self.httpd.request_counts)
+
+    def start(self):
+        """Serves requests on a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Local mock of the Google Routes, Route Optimization and Places APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean seconds added to every response")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="Standard deviation of the added latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server = MockGoogleServer(args.host, args.port, args.latency, args.latency_jitter, args.error_rate, args.seed,
+                              verbose=True)
+    print(f"Mock Google APIs on {server.url}; set GOOGLE_ROUTES_BASE_URL, GOOGLE_ROUTE_OPTIMIZATION_BASE_URL "
+          f"and GOOGLE_PLACES_BASE_URL to it")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
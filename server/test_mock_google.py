@@ -0,0 +1,49 @@
+import pytest
+import requests
+from mock_google import MockGoogleServer
+
+@pytest.fixture
+def mock():
+    with MockGoogleServer() as server:
+        yield server
+
+def test_compute_route_matrix(mock):
+    body = {
+        "origins": [{"waypoint": {"placeId": "a"}}, {"waypoint": {"placeId": "b"}}],
+        "destinations": [{"waypoint": {"placeId": "a"}}, {"waypoint": {"placeId": "b"}}],
+        "travelMode": "DRIVE",
+    }
+    elements = requests.post(f"{mock.url}/distanceMatrix/v2:computeRouteMatrix", json=body).json()
+    assert len(elements) == 4
+    by_pair = {(e['originIndex'], e['destinationIndex']): e for e in elements}
+    assert by_pair[0, 0]['duration'] == "0s"
+    assert by_pair[0, 1]['duration'] == by_pair[1, 0]['duration']
+    assert int(by_pair[0, 1]['duration'][:-1]) > 0 and by_pair[0, 1]['distanceMeters'] > 0
+
+def test_optimize_tours_shape(mock):
+    body = {"model": {
+        "shipments": [{"pickups": [{"arrivalWaypoint": {"placeId": "b"}}],
+                       "deliveries": [{"arrivalWaypoint": {"placeId": "c"}}]}],
+        "vehicles": [{"startWaypoint": {"placeId": "a"}, "endWaypoint": {"placeId": "d"}}],
+    }}
+    response = requests.post(f"{mock.url}/v1/projects/demo:optimizeTours", json=body).json()
+    totals = response["metrics"]["aggregatedRouteMetrics"]
+    assert int(totals["totalDuration"][:-1]) > 0
+    assert totals["travelDistanceMeters"] == sum(t["travelDistanceMeters"] for t in response["routes"][0]["transitions"])
+    assert response["routes"][0]["routePolyline"]["points"]
+
+def test_places_and_routes(mock):
+    place_id = requests.post(f"{mock.url}/v1/places:searchText", json={"textQuery": "Corvallis, OR"}).json()["places"][0]["id"]
+    assert requests.get(f"{mock.url}/v1/places/{place_id}").json()["id"] == place_id
+    route = requests.post(f"{mock.url}/directions/v2:computeRoutes",
+                          json={"origin": {"placeId": place_id}, "destination": {"placeId": "x"}}).json()
+    assert route["routes"][0]["duration"].endswith("s")
+    assert requests.post(f"{mock.url}/directions/v2:computeRoutes", json={}).status_code == 400
+    assert requests.post(f"{mock.url}/v1/unknown", json={}).status_code == 404
+
+def test_error_rate():
+    with MockGoogleServer(error_rate=1.0) as mock:
+        response = requests.post(f"{mock.url}/v1/places:searchText", json={"textQuery": "x"})
+        assert response.status_code == 503
+        assert response.json()["error"]["status"] == "UNAVAILABLE"
+        assert mock.request_counts == {"/v1/places:searchText": 1}